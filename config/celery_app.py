@@ -1,11 +1,17 @@
+import logging
+
 from celery import Celery
 from celery.signals import setup_logging
+from celery.signals import worker_process_init
+from celery.signals import worker_process_shutdown
 
 # Setup environment before importing Django
 from config.env_setup import setup_django_environment
 
 setup_django_environment()
 
+logger = logging.getLogger(__name__)
+
 app = Celery("sdm_platform")
 
 # Using a string here means the worker doesn't have to serialize
@@ -24,5 +30,27 @@ def config_loggers(*args, **kwargs):
     dictConfig(settings.LOGGING)
 
 
+@worker_process_init.connect
+def warm_graph_checkpointer(*args, **kwargs):
+    from sdm_platform.llmchat.utils.graphs import (  # noqa: PLC0415
+        warm_postgres_checkpointer,
+    )
+
+    try:
+        warm_postgres_checkpointer()
+    except Exception:
+        # Tasks fall back to opening their own connection
+        logger.exception("Failed to warm the Postgres checkpointer")
+
+
+@worker_process_shutdown.connect
+def close_graph_checkpointer(*args, **kwargs):
+    from sdm_platform.llmchat.utils.graphs import (  # noqa: PLC0415
+        close_postgres_checkpointer,
+    )
+
+    close_postgres_checkpointer()
+
+
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
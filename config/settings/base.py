@@ -431,6 +431,11 @@ LLM_CHAT_MODEL = env("LLM_CHAT_MODEL", default="openai:gpt-4.1")
 LLM_EXTRACTION_MODEL = env("LLM_EXTRACTION_MODEL", default="openai:gpt-4.1")
 LLM_SUMMARY_MODEL = env("LLM_SUMMARY_MODEL", default="openai:gpt-4.1")
 
+# Approximate token budget for the messages sent to the chat model each turn.
+# Older messages beyond it are left out of the prompt (they stay in the stored
+# conversation history), so per-turn cost doesn't grow with conversation length.
+LLM_MAX_PROMPT_TOKENS = env.int("LLM_MAX_PROMPT_TOKENS", default=8000)
+
 # Embedding Model Configuration
 # ------------------------------------------------------------------------------
 # WARNING: Changing the embedding model requires re-ingesting ALL documents in ChromaDB.
@@ -37,6 +37,31 @@ MEDIA_URL = "http://media.testserver/"
 # Your stuff...
 # ------------------------------------------------------------------------------
 
+# MIGRATIONS
+# ------------------------------------------------------------------------------
+# Build the test database straight from the models instead of replaying every
+# migration. The data migrations aren't needed here: tests create the journeys
+# they use, and the LangGraph checkpointer/store tables live in the
+# DATABASE_URL database rather than the test database.
+class DisableMigrations:
+    def __contains__(self, item):
+        return True
+
+    def __getitem__(self, item):
+        return None
+
+
+MIGRATION_MODULES = DisableMigrations()
+
+# CHANNELS
+# ------------------------------------------------------------------------------
+# In-process layer: consumer tests exercise group_send without Redis
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+    },
+}
+
 # SOCIAL AUTH
 # ------------------------------------------------------------------------------
 # Override SOCIALACCOUNT_PROVIDERS to use test values
@@ -113,5 +113,5 @@ class DocumentAdmin(admin.ModelAdmin):
 
 @admin.register(DocumentChunk)
 class DocumentChunkAdmin(admin.ModelAdmin):
-    list_display = ("document", "chunk_index", "text_hash", "created_at")
+    list_display = ("document", "version", "chunk_index", "text_hash", "created_at")
     search_fields = ("text",)
@@ -6,6 +6,7 @@ from django.core.management.base import BaseCommand
 from django.core.management.base import CommandError
 
 from sdm_platform.evidence.models import Document
+from sdm_platform.evidence.utils.chroma import GLOBAL_COLLECTION
 from sdm_platform.evidence.utils.chroma import get_chroma_client
 
 logger = getLogger(__name__)
@@ -37,7 +38,9 @@ class Command(BaseCommand):
         try:
             collection = client.get_collection(collection_name)
             collection.delete(where={"document_id": str(doc_id)})
-            client.delete_collection(collection_name)
+            # a per-document collection from before the shared one can go too
+            if collection_name != GLOBAL_COLLECTION:
+                client.delete_collection(collection_name)
             logger.info("Deleted vectors for %s from %s", doc_id, collection_name)
 
         except chromadb.errors.ChromaError:
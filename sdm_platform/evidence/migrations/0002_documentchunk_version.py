@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-16
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_chunk_versions(apps, schema_editor):
+    """Existing chunk rows were written by the document's latest ingest."""
+    Document = apps.get_model("evidence", "Document")
+    DocumentChunk = apps.get_model("evidence", "DocumentChunk")
+    DocumentChunk.objects.update(
+        version=Subquery(
+            Document.objects.filter(pk=OuterRef("document_id")).values("version")[:1],
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("evidence", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="documentchunk",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(set_chunk_versions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="documentchunk",
+            unique_together={("document", "version", "chunk_index")},
+        ),
+    ]
@@ -121,6 +121,9 @@ class Document(models.Model):
 class DocumentChunk(models.Model):
     """
     Stores document chunks tied to a specific version.
+
+    Rows from earlier versions are kept so citations in older conversations
+    still show the text they were answered from.
     """
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -129,15 +132,14 @@ class DocumentChunk(models.Model):
         on_delete=models.CASCADE,
         related_name="chunks",
     )
+    version = models.PositiveIntegerField(default=1)
     chunk_index = models.PositiveIntegerField()
     text = models.TextField()
     text_hash = models.CharField(max_length=64, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ("document", "chunk_index")
+        unique_together = ("document", "version", "chunk_index")
 
     def __str__(self):
-        return (
-            f"{self.document.name} v{self.document.version} - chunk {self.chunk_index}"
-        )
+        return f"{self.document.name} v{self.version} - chunk {self.chunk_index}"
@@ -27,6 +27,7 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from sdm_platform.evidence.models import Document
 from sdm_platform.evidence.models import DocumentChunk
+from sdm_platform.evidence.utils.chroma import GLOBAL_COLLECTION
 from sdm_platform.evidence.utils.chroma import get_chroma_client
 
 logger = logging.getLogger(__name__)
@@ -70,7 +71,10 @@ def using_cloud() -> bool:
 
 class DocumentIngestor:
     """
-    Ingest a Document into Chroma with a safe tmp -> perm swap.
+    Ingest a Document into the shared Chroma collection.
+
+    The new version's chunks are written and verified before the previous
+    version's chunks are removed, so the document stays searchable throughout.
 
     Defaults to the configured LLM_EMBEDDING_MODEL when no embedding_model is provided.
     """
@@ -137,7 +141,7 @@ class DocumentIngestor:
 
         return embeddings
 
-    def ingest(self) -> dict:  # noqa: PLR0912, PLR0915, C901
+    def ingest(self) -> dict:  # noqa: PLR0915
         logger.info("Starting ingest for document=%s", self.document.id)
 
         # load & cache full text
@@ -184,9 +188,10 @@ class DocumentIngestor:
 
             metadatas.append(md)
 
-            # cache chunk in DB
+            # cache chunk in DB; earlier versions' rows stay for old citations
             DocumentChunk.objects.update_or_create(
                 document=self.document,
+                version=self.document.version,
                 chunk_index=i,
                 defaults={"text": txt, "text_hash": h},
             )
@@ -194,31 +199,8 @@ class DocumentIngestor:
         # compute embeddings
         embeddings = self._compute_embeddings(texts)
 
-        tmp_col_name = f"doc_{self.document.id}_v{self.document.version}_tmp"
-        perm_col_name = f"doc_{self.document.id}_v{self.document.version}"
-
-        # defensive: delete leftover tmp if present
-        existing = [c.name for c in self.chroma_client.list_collections()]
-        logger.debug("Chroma existing collections (pre-ingest): %s", existing)
-        if tmp_col_name in existing:
-            try:
-                logger.warning("Deleting leftover tmp collection: %s", tmp_col_name)
-                self.chroma_client.delete_collection(tmp_col_name)
-            except ChromaError:
-                logger.exception(
-                    "Failed to delete leftover tmp collection: %s",
-                    tmp_col_name,
-                )
-
-        # create tmp collection and add vectors
-        try:
-            tmp_col = (
-                self.chroma_client.get_or_create_collection(name=tmp_col_name)
-                if hasattr(self.chroma_client, "get_or_create_collection")
-                else self.chroma_client.create_collection(name=tmp_col_name)
-            )
-        except ChromaError:
-            tmp_col = self.chroma_client.create_collection(name=tmp_col_name)
+        # all documents share one collection; chunk ids are unique per version
+        col = self.chroma_client.get_or_create_collection(name=GLOBAL_COLLECTION)
 
         # setting the max_api_size doesn't actually work, which is why we have to create
         #  batches manually.  but if they do fix it, you can replace this w/
@@ -230,63 +212,41 @@ class DocumentIngestor:
             documents=texts,
         )
         for batch in batches:
-            tmp_col.add(*batch)
-        logger.info("Added %d vectors to tmp collection %s", len(ids), tmp_col_name)
+            col.upsert(*batch)
+        logger.info(
+            "Upserted %d vectors into collection %s",
+            len(ids),
+            GLOBAL_COLLECTION,
+        )
 
-        # verify tmp count
-        count = tmp_col.count()
+        # verify the new version landed before retiring the previous one
+        stored = col.get(where={"document_id": str(self.document.id)}, include=[])
+        stored_ids = set(stored["ids"])
+        new_ids = set(ids)
+        count = len(stored_ids & new_ids)
         if count != len(ids):
-            try:
-                self.chroma_client.delete_collection(tmp_col_name)
-            except ChromaError:
-                logger.exception("Error deleting tmp collection after count mismatch.")
             errmsg = f"Chroma wrote {count} vectors but expected {len(ids)}"
             raise RuntimeError(errmsg)
 
-        # create perm collection (delete existing if present)
-        existing_after = [c.name for c in self.chroma_client.list_collections()]
-        if perm_col_name in existing_after:
-            logger.info("Perm collection already exists; deleting: %s", perm_col_name)
+        # drop chunks from earlier versions (or a longer run of this version)
+        stale_ids = list(stored_ids - new_ids)
+        if stale_ids:
             try:
-                self.chroma_client.delete_collection(perm_col_name)
+                col.delete(ids=stale_ids)
+                logger.info(
+                    "Deleted %d stale vectors for document %s",
+                    len(stale_ids),
+                    self.document.id,
+                )
             except ChromaError:
                 logger.exception(
-                    "Failed to delete existing perm collection %s; continuing",
-                    perm_col_name,
+                    "Failed to delete stale vectors for document %s (non-fatal)",
+                    self.document.id,
                 )
 
-        if hasattr(self.chroma_client, "get_or_create_collection"):
-            perm_col = self.chroma_client.get_or_create_collection(name=perm_col_name)
-        else:
-            perm_col = self.chroma_client.create_collection(name=perm_col_name)
-
-        batches = create_batches_local(
-            ids=ids,
-            embeddings=embeddings,  # pyright: ignore[reportArgumentType]
-            metadatas=metadatas,
-            documents=texts,
-        )
-        for batch in batches:
-            perm_col.add(*batch)
-        logger.info(
-            "Copied %d vectors into perm collection %s",
-            len(ids),
-            perm_col_name,
-        )
-
-        # delete tmp collection
-        try:
-            self.chroma_client.delete_collection(tmp_col_name)
-            logger.info("Deleted tmp collection %s", tmp_col_name)
-        except ChromaError:
-            logger.exception(
-                "Failed to delete tmp collection %s (non-fatal)",
-                tmp_col_name,
-            )
-
         # update document record and clean up the old collection
         old_collection = self.document.chroma_collection
-        self.document.chroma_collection = perm_col_name
+        self.document.chroma_collection = GLOBAL_COLLECTION
         self.document.vector_count = count
         self.document.processing_status = Document.ProcessingStatus.COMPLETED
         self.document.is_active = True
@@ -302,7 +262,8 @@ class DocumentIngestor:
             ],
         )
 
-        if old_collection and old_collection != perm_col_name:
+        # documents ingested before the shared collection had one of their own
+        if old_collection and old_collection != GLOBAL_COLLECTION:
             try:
                 logger.info("Deleting old collection %s", old_collection)
                 self.chroma_client.delete_collection(old_collection)
@@ -315,7 +276,7 @@ class DocumentIngestor:
         logger.info(
             "Ingest complete: document=%s -> collection=%s (vectors=%d)",
             self.document.id,
-            perm_col_name,
+            GLOBAL_COLLECTION,
             count,
         )
-        return {"collection": perm_col_name, "vector_count": count}
+        return {"collection": GLOBAL_COLLECTION, "vector_count": count}
@@ -1 +1,209 @@
-# Create your tests here.
+# ruff: noqa: PLR2004
+# PLR2004 is literal values
+"""Tests for evidence ingestion and removal from Chroma."""
+
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from langchain_core.documents import Document as LCDocument
+
+from sdm_platform.evidence.management.commands import delete_document_from_chroma
+from sdm_platform.evidence.models import Document
+from sdm_platform.evidence.services import ingest
+from sdm_platform.evidence.services.ingest import DocumentIngestor
+from sdm_platform.evidence.utils.chroma import GLOBAL_COLLECTION
+from sdm_platform.llmchat.utils.citations import hydrate_citations
+
+
+class _FakeCollection:
+    """In-memory stand-in for a Chroma collection (ids and metadata only)"""
+
+    def __init__(self):
+        self.metadatas = {}
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None):
+        self.metadatas.update(zip(ids, metadatas, strict=True))
+
+    def _matches(self, where):
+        return [
+            item_id
+            for item_id, md in self.metadatas.items()
+            if all(md.get(key) == value for key, value in where.items())
+        ]
+
+    def get(self, where, include=None):
+        return {"ids": self._matches(where)}
+
+    def delete(self, ids=None, where=None):
+        for item_id in ids if ids is not None else self._matches(where):
+            del self.metadatas[item_id]
+
+
+class _FakeChromaClient:
+    """In-memory stand-in for the Chroma client"""
+
+    def __init__(self):
+        self.collections = {}
+        self.delete_collection = MagicMock(side_effect=self.collections.pop)
+
+    def get_or_create_collection(self, name):
+        return self.collections.setdefault(name, _FakeCollection())
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+
+class _FakeEmbeddings:
+    """Embeddings double: one fixed-size vector per text"""
+
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+class _ChromaTestCase(TestCase):
+    """Patch the shared Chroma client with an in-memory fake"""
+
+    def setUp(self):
+        self.client = _FakeChromaClient()
+        for module in (ingest, delete_document_from_chroma):
+            patcher = patch.object(
+                module,
+                "get_chroma_client",
+                return_value=self.client,
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _create_document(self, **kwargs):
+        return Document.objects.create(
+            name="Back pain guide",
+            file="documents/guide.txt",
+            chunk_size=20,
+            chunk_overlap=0,
+            **kwargs,
+        )
+
+    def _ingest(self, document, text):
+        """Ingest document as if its file contained text"""
+        with patch.object(
+            DocumentIngestor,
+            "_load_text",
+            return_value=[LCDocument(page_content=text)],
+        ):
+            return DocumentIngestor(document, _FakeEmbeddings()).ingest()
+
+    def _stored_ids(self, document):
+        collection = self.client.collections[GLOBAL_COLLECTION]
+        return set(collection.get(where={"document_id": str(document.id)})["ids"])
+
+
+class DocumentIngestorTest(_ChromaTestCase):
+    """Test ingesting documents into the shared collection."""
+
+    three_chunks = "alpha beta gamma\ndelta epsilon zeta\neta theta iota"
+    two_chunks = "alpha beta gamma\ndelta epsilon zeta"
+
+    def test_ingest_writes_to_global_collection(self):
+        """Test chunks land in the shared collection and the record is updated."""
+        document = self._create_document()
+
+        result = self._ingest(document, self.three_chunks)
+
+        self.assertEqual(result, {"collection": GLOBAL_COLLECTION, "vector_count": 3})
+        self.assertEqual(
+            self._stored_ids(document),
+            {f"{document.id}_v1_c{i}" for i in range(3)},
+        )
+        document.refresh_from_db()
+        self.assertEqual(document.chroma_collection, GLOBAL_COLLECTION)
+        self.assertEqual(document.vector_count, 3)
+        self.assertEqual(
+            document.processing_status,
+            Document.ProcessingStatus.COMPLETED,
+        )
+        self.client.delete_collection.assert_not_called()
+
+    def test_reingest_deletes_stale_chunks(self):
+        """Test a new version replaces every chunk of the previous one."""
+        document = self._create_document()
+        other = self._create_document()
+        self._ingest(document, self.three_chunks)
+        self._ingest(other, self.two_chunks)
+
+        document.bump_version()
+        result = self._ingest(document, self.two_chunks)
+
+        self.assertEqual(result["vector_count"], 2)
+        self.assertEqual(
+            self._stored_ids(document),
+            {f"{document.id}_v2_c{i}" for i in range(2)},
+        )
+        # Other documents in the shared collection are left alone
+        self.assertEqual(len(self._stored_ids(other)), 2)
+
+    def test_reingest_keeps_earlier_citation_text(self):
+        """Test a citation of the previous version still shows its own text."""
+        document = self._create_document()
+        self._ingest(document, self.three_chunks)
+        doc_id = str(document.id)
+        earlier = [
+            {"index": 1, "doc_id": doc_id, "version": 1, "chunk_index": 0},
+            {"index": 2, "doc_id": doc_id, "version": 1, "chunk_index": 2},
+        ]
+
+        document.bump_version()
+        self._ingest(document, "kappa lambda mu\nnu xi omicron")
+        latest = {"index": 3, "doc_id": doc_id, "version": 2, "chunk_index": 0}
+
+        self.assertEqual(
+            [citation["excerpt"] for citation in hydrate_citations([*earlier, latest])],
+            ["alpha beta gamma", "eta theta iota", "kappa lambda mu"],
+        )
+
+    def test_reingest_removes_legacy_collection(self):
+        """Test a document's old per-document collection is dropped."""
+        legacy = "doc_legacy_v1"
+        document = self._create_document(chroma_collection=legacy)
+        self.client.get_or_create_collection(legacy)
+
+        self._ingest(document, self.two_chunks)
+
+        self.client.delete_collection.assert_called_once_with(legacy)
+        self.assertNotIn(legacy, self.client.collections)
+        self.assertEqual(len(self._stored_ids(document)), 2)
+
+
+class DeleteDocumentFromChromaTest(_ChromaTestCase):
+    """Test the delete_document_from_chroma management command."""
+
+    def test_delete_keeps_global_collection(self):
+        """Test only the document's vectors leave the shared collection."""
+        document = self._create_document()
+        other = self._create_document()
+        self._ingest(document, "alpha beta gamma\ndelta epsilon zeta")
+        self._ingest(other, "alpha beta gamma")
+
+        call_command("delete_document_from_chroma", str(document.id))
+
+        self.assertEqual(self._stored_ids(document), set())
+        self.assertEqual(len(self._stored_ids(other)), 1)
+        self.client.delete_collection.assert_not_called()
+        document.refresh_from_db()
+        self.assertFalse(document.is_active)
+        self.assertEqual(document.processing_status, Document.ProcessingStatus.PENDING)
+
+    def test_delete_drops_legacy_collection(self):
+        """Test a per-document collection from before the shared one is removed."""
+        legacy = "doc_legacy_v1"
+        document = self._create_document(chroma_collection=legacy)
+        self.client.get_or_create_collection(legacy).upsert(
+            ["legacy_c0"],
+            metadatas=[{"document_id": str(document.id)}],
+        )
+
+        call_command("delete_document_from_chroma", str(document.id))
+
+        self.client.delete_collection.assert_called_once_with(legacy)
+        self.assertNotIn(legacy, self.client.collections)
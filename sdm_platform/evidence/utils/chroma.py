@@ -1,3 +1,4 @@
+import functools
 import logging
 
 import chromadb
@@ -5,10 +6,17 @@ from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Every ingested document's chunks live here, tagged with document_id/version
+# metadata, so retrieval is a single top-k query instead of one per document
+GLOBAL_COLLECTION = "documents_global"
 
+
+@functools.cache
 def get_chroma_client():
     """
     Return a chromadb client instance (cloud only).
+
+    The client is created once per process and shared by every caller.
     """
     logger.info("Initializing Chroma Cloud client")
     return chromadb.CloudClient(
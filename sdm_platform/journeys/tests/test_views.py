@@ -30,14 +30,11 @@ class JourneyLandingViewTest(TestCase):
 
     def test_journey_landing_authenticated(self):
         """Test landing page for authenticated user"""
-        _ = User.objects.create_user(
+        user = User.objects.create_user(
             email="test@example.com",
             password="testpass123",
         )
-        self.client.login(
-            username="test@example.com",
-            password="testpass123",
-        )
+        self.client.force_login(user)
 
         response = self.client.get(
             reverse(
@@ -114,10 +111,7 @@ class JourneyOnboardingViewTest(TestCase):
 
     def test_onboarding_get_authenticated(self):
         """Test GET request to onboarding when authenticated"""
-        self.client.login(
-            username="test@example.com",
-            password="testpass123",
-        )
+        self.client.force_login(self.user)
 
         response = self.client.get(
             reverse(
@@ -133,10 +127,7 @@ class JourneyOnboardingViewTest(TestCase):
 
     def test_onboarding_get_with_existing_response(self):
         """Test GET request when user already has a response"""
-        self.client.login(
-            username="test@example.com",
-            password="testpass123",
-        )
+        self.client.force_login(self.user)
 
         existing_response = JourneyResponse.objects.create(
             journey=self.journey,
@@ -159,10 +150,7 @@ class JourneyOnboardingViewTest(TestCase):
 
     def test_onboarding_post_authenticated(self):
         """Test POST submission when authenticated"""
-        self.client.login(
-            username="test@example.com",
-            password="testpass123",
-        )
+        self.client.force_login(self.user)
 
         data = {
             "responses": {
@@ -303,10 +291,7 @@ class JourneyOnboardingViewTest(TestCase):
 
     def test_onboarding_post_creates_conversation_with_system_prompt(self):
         """Test that onboarding creates conversation with proper system prompt"""
-        self.client.login(
-            username="test@example.com",
-            password="testpass123",
-        )
+        self.client.force_login(self.user)
 
         data = {
             "responses": {
@@ -3,6 +3,7 @@ import json
 import logging
 from zoneinfo import ZoneInfo
 
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
 
@@ -17,7 +18,7 @@ def get_useremail_from_scope(scope):
     return user.email if user and hasattr(user, "email") else "Anonymous"
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
         # -- set the chat room to be specific to the user
         username = get_useremail_from_scope(self.scope)
@@ -37,18 +38,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, code):
         await self.channel_layer.group_discard(self.thread_name, self.channel_name)
 
-    async def receive(
-        self,
-        text_data: str | None = None,
-        bytes_data: bytes | None = None,
-    ) -> None:
-        if text_data is None:
-            return
-        text_data_json = json.loads(text_data)
-        if text_data_json.get("type") == "ping":
-            await self.send(text_data=json.dumps({"type": "pong"}))
+    async def receive_json(self, content, **kwargs) -> None:
+        if content.get("type") == "ping":
+            await self.send_json({"type": "pong"})
         else:
-            message = text_data_json["message"]
+            message = content["message"]
             await self.channel_layer.group_send(
                 self.thread_name,
                 {
@@ -63,23 +57,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
     # -- echo back the message received from the 'send' input
     async def chat_message(self, event):
         username = get_useremail_from_scope(self.scope)
-        await self.send(
-            text_data=json.dumps(
-                format_message(
-                    role="user",
-                    name=username,
-                    message=event["message"],
-                    timestamp=datetime.datetime.now(ZoneInfo(settings.TIME_ZONE)),
-                    citations=[],
-                ),
+        await self.send_json(
+            format_message(
+                role="user",
+                name=username,
+                message=event["message"],
+                timestamp=datetime.datetime.now(ZoneInfo(settings.TIME_ZONE)),
+                citations=[],
             ),
         )
 
     # -- send along the reply from the LLM bot
     async def chat_reply(self, event):
-        await self.send(
-            text_data=event["content"],  # already formatted
-        )
+        await self.send_json(event["payload"])  # already formatted by the task
 
 
 class StatusConsumer(AsyncWebsocketConsumer):
@@ -1,7 +1,6 @@
 """Celery tasks for doing LLM stuff off the hot path"""
 
 import datetime
-import json
 import logging
 from zoneinfo import ZoneInfo
 
@@ -17,6 +16,7 @@ from langchain_core.messages import HumanMessage
 from langchain_core.messages import SystemMessage
 from langchain_core.runnables import RunnableConfig
 
+from sdm_platform.llmchat.utils.citations import hydrate_citations
 from sdm_platform.llmchat.utils.format import format_message
 from sdm_platform.llmchat.utils.graphs import get_compiled_graph
 from sdm_platform.llmchat.utils.graphs import get_postgres_checkpointer
@@ -163,16 +163,19 @@ def send_llm_reply(thread_name: str, username: str, user_input: str):
         # Send reply if LLM responded (memory extraction is handled by graph node)
         if reply["messages"][-1].type == "ai":
             # Update conversation analytics (user message + AI response = 2 messages)
+            # A queryset update() skips auto_now, so bump updated_at explicitly
+            now = timezone.now()
             Conversation.objects.filter(id=thread_name).update(
                 message_count=F("message_count") + 2,
-                last_message_at=timezone.now(),
+                last_message_at=now,
+                updated_at=now,
             )
             reply_dict = format_message(
                 "bot",
                 settings.AI_ASSISTANT_NAME,
                 reply["messages"][-1].content,
                 datetime.datetime.now(ZoneInfo(settings.TIME_ZONE)),
-                reply["turn_citations"],
+                hydrate_citations(reply["turn_citations"]),
                 decision_aids=reply.get("turn_decision_aids", []),
             )
 
@@ -181,7 +184,7 @@ def send_llm_reply(thread_name: str, username: str, user_input: str):
                     thread_name,
                     {
                         "type": "chat.reply",
-                        "content": json.dumps(reply_dict),
+                        "payload": reply_dict,
                     },
                 )
     finally:
@@ -331,6 +334,7 @@ def send_ai_initiated_message(
         Conversation.objects.filter(id=thread_name).update(
             message_count=F("message_count") + 1,
             last_message_at=now,
+            updated_at=now,
         )
 
         # Send the message through WebSocket
@@ -347,7 +351,7 @@ def send_ai_initiated_message(
                 thread_name,
                 {
                     "type": "chat.reply",
-                    "content": json.dumps(reply_dict),
+                    "payload": reply_dict,
                 },
             )
 
@@ -2,53 +2,161 @@
 # ... ignore the assertion stuff and also the hardcoded passwords
 # pyright: reportGeneralTypeIssues=false, reportArgumentType=false
 # ... the channel stuff
+import asyncio
 import datetime
-import json
+import os
+from contextlib import ExitStack
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import date
+from types import SimpleNamespace
+from unittest.mock import DEFAULT
 from unittest.mock import AsyncMock
 from unittest.mock import MagicMock
 from unittest.mock import patch
 from zoneinfo import ZoneInfo
 
-from channels.db import database_sync_to_async
+from channels.layers import InMemoryChannelLayer
 from channels.layers import get_channel_layer
 from channels.testing import WebsocketCommunicator
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.test import Client
+from django.test import SimpleTestCase
 from django.test import TestCase
-from django.test import TransactionTestCase
+from django.test import override_settings
 from django.urls import reverse
 from langchain_core.documents import Document
 from langchain_core.messages import AIMessage
 from langchain_core.messages import HumanMessage
+from langchain_core.messages import SystemMessage
 from langchain_core.runnables import RunnableConfig
-
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END
+from langgraph.graph import START
+from langgraph.graph import StateGraph
+from langgraph.store.memory import InMemoryStore
+
+from sdm_platform.evidence.models import Document as EvidenceDocument
+from sdm_platform.evidence.models import DocumentChunk
+from sdm_platform.evidence.utils.chroma import GLOBAL_COLLECTION
 from sdm_platform.journeys.models import DecisionAid
 from sdm_platform.journeys.models import Journey
+from sdm_platform.llmchat import tasks as llmchat_tasks
+from sdm_platform.llmchat import views as llmchat_views
 from sdm_platform.llmchat.consumers import ChatConsumer
 from sdm_platform.llmchat.consumers import get_useremail_from_scope
 from sdm_platform.llmchat.models import Conversation
 from sdm_platform.llmchat.tasks import send_llm_reply
 from sdm_platform.llmchat.utils.chat_history import get_chat_history
+from sdm_platform.llmchat.utils.citations import EXCERPT_MAX_LENGTH
+from sdm_platform.llmchat.utils.citations import hydrate_citations
 from sdm_platform.llmchat.utils.format import format_message
+from sdm_platform.llmchat.utils.graphs import _COMPILED_GRAPHS
+from sdm_platform.llmchat.utils.graphs import GraphMode
+from sdm_platform.llmchat.utils.graphs import GraphRegistry
+from sdm_platform.llmchat.utils.graphs import SdmState
 from sdm_platform.llmchat.utils.graphs import get_compiled_graph
 from sdm_platform.llmchat.utils.graphs import get_postgres_checkpointer
+from sdm_platform.llmchat.utils.graphs.base import GLOBAL_INSTRUCTIONS
+from sdm_platform.llmchat.utils.graphs.base import _build_system_message_and_continue
+from sdm_platform.llmchat.utils.graphs.base import _init_chat_model
+from sdm_platform.llmchat.utils.graphs.base import _init_embeddings
+from sdm_platform.llmchat.utils.graphs.base import _render_system_content
+from sdm_platform.llmchat.utils.graphs.nodes import create_assistant_human_turn
+from sdm_platform.llmchat.utils.graphs.nodes import retrieval
+from sdm_platform.llmchat.utils.graphs.nodes.model import _prompt_messages
+from sdm_platform.llmchat.utils.graphs.nodes.retrieval import _COLLECTIONS_CACHE
+from sdm_platform.llmchat.utils.graphs.nodes.retrieval import _COLLECTIONS_CACHE_TTL
+from sdm_platform.llmchat.utils.graphs.nodes.retrieval import _VECTOR_STORES
+from sdm_platform.llmchat.utils.graphs.nodes.retrieval import _get_collections_to_search
+from sdm_platform.llmchat.utils.graphs.nodes.retrieval import (
+    _retrieve_top_k_from_collections,
+)
+from sdm_platform.llmchat.utils.graphs.nodes.retrieval import _search_evidence
 from sdm_platform.llmchat.utils.tools.decision_aids import _convert_to_embed_url
 from sdm_platform.llmchat.utils.tools.decision_aids import show_decision_aid
 from sdm_platform.memory.managers import UserProfileManager
 from sdm_platform.memory.store import get_memory_store
 from sdm_platform.users.models import User
 
+# create_user() and client.login() hash passwords; under `manage.py test` the
+# project's PBKDF2/Argon2 hashers would dominate setup time
+fast_password_hashers = override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+
+_default_loop_policy = None
+
+
+def setUpModule():
+    """Run this module's async tests on uvloop when it is installed"""
+    global _default_loop_policy  # noqa: PLW0603
+    try:
+        import uvloop  # noqa: PLC0415
+    except ImportError:
+        return  # stdlib asyncio loop
+    _default_loop_policy = asyncio.get_event_loop_policy()
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+def tearDownModule():
+    if _default_loop_policy is not None:
+        asyncio.set_event_loop_policy(_default_loop_policy)
+
+
+# Keep consumer tests off Redis even when run with the local/dev settings
+in_memory_channel_layer = override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+
+# ASGI app for communicator tests; it builds a fresh consumer per connection,
+# so one app serves every test
+_CHAT_ASGI = ChatConsumer.as_asgi()
+
+
+def _session_cookie_for(user):
+    """Log ``user`` in once and return a session id tests can reuse as a cookie"""
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+# Settings read once at import; fixed timestamp keeps message fixtures deterministic
+_AI_NAME = settings.AI_ASSISTANT_NAME
+_TZ = ZoneInfo(settings.TIME_ZONE)
+_NOW = datetime.datetime(2024, 6, 1, 12, 0, 0, tzinfo=_TZ)
 
+# A formatted bot reply, as send_llm_reply puts it on the channel layer
+_BOT_REPLY_PAYLOAD = format_message(
+    role="bot",
+    name=_AI_NAME,
+    message="This is the bot response",
+    timestamp=_NOW,
+    citations=[],
+)
+
+
+@fast_password_hashers
 class ConversationModelTest(TestCase):
     """Test the Conversation model"""
 
-    def setUp(self):
-        self.user = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
             email="test@example.com",
             password="testpass123",
         )
+        # One INSERT for all the fixtures the tests below only read or modify
+        cls.titled_conversation, cls.untitled_conversation = (
+            Conversation.objects.bulk_create(
+                [
+                    Conversation(user=cls.user, title="Test Title"),
+                    Conversation(user=cls.user),
+                ],
+                batch_size=100,
+            )
+        )
 
     def test_conversation_creation(self):
         """Test creating a conversation"""
@@ -66,19 +174,14 @@ class ConversationModelTest(TestCase):
 
     def test_conversation_str_representation(self):
         """Test the string representation of a conversation"""
-        conv = Conversation.objects.create(
-            user=self.user,
-            title="Test Title",
-        )
+        conv = self.titled_conversation
 
         expected = f"Conversation: {self.user.email} / Test Title ({conv.id})"
         self.assertEqual(str(conv), expected)
 
     def test_conversation_defaults(self):
         """Test default values for conversation fields"""
-        conv = Conversation.objects.create(
-            user=self.user,
-        )
+        conv = self.untitled_conversation
 
         self.assertEqual(conv.title, "")
         self.assertEqual(conv.system_prompt, "")
@@ -86,14 +189,16 @@ class ConversationModelTest(TestCase):
 
     def test_conversation_updated_at_changes(self):
         """Test that updated_at changes when conversation is saved"""
-        conv = Conversation.objects.create(
-            user=self.user,
-        )
+        conv = self.untitled_conversation
 
         original_updated_at = conv.updated_at
+        # Step the clock auto_now reads instead of relying on real time passing
+        later = original_updated_at + datetime.timedelta(seconds=1)
         conv.title = "Updated Title"
-        conv.save()
+        with patch("django.utils.timezone.now", return_value=later):
+            conv.save()
 
+        self.assertEqual(conv.updated_at, later)
         self.assertGreater(conv.updated_at, original_updated_at)
 
     @patch("sdm_platform.llmchat.models.get_postgres_checkpointer")
@@ -105,9 +210,7 @@ class ConversationModelTest(TestCase):
         mock_checkpointer = MagicMock()
         mock_get_checkpointer.return_value.__enter__.return_value = mock_checkpointer
 
-        conv = Conversation.objects.create(
-            user=self.user,
-        )
+        conv = self.untitled_conversation
 
         thread_id = conv.thread_id
         conv.delete()
@@ -116,21 +219,27 @@ class ConversationModelTest(TestCase):
         mock_checkpointer.delete_thread.assert_called_once_with(thread_id)
 
 
+@fast_password_hashers
 class ConversationViewTest(TestCase):
     """Test the conversation view"""
 
-    def setUp(self):
-        self.client = Client()
-        self.user = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
             email="test@example.com",
             password="testpass123",
         )
-        self.client.login(username="test@example.com", password="testpass123")
+        cls.list_url = reverse("conversation_list")
+        cls.session_id = _session_cookie_for(cls.user)
+
+    def setUp(self):
+        # The session row lives as long as the class fixtures; just present it
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = self.session_id
 
     def test_conversation_view_requires_login(self):
         """Test that conversation view requires authentication"""
         self.client.logout()
-        response = self.client.get(reverse("conversation_list"))
+        response = self.client.get(self.list_url)
 
         # Should redirect to login
         self.assertEqual(response.status_code, 302)
@@ -138,7 +247,7 @@ class ConversationViewTest(TestCase):
 
     def test_conversation_view_creates_default_conversation(self):
         """Test that accessing conversation view creates a default conversation"""
-        response = self.client.get(reverse("conversation_list"))
+        response = self.client.get(self.list_url)
 
         self.assertEqual(response.status_code, 200)
         conversations = Conversation.objects.filter(user=self.user)
@@ -152,7 +261,7 @@ class ConversationViewTest(TestCase):
             title="First Conversation",
         )
 
-        response = self.client.get(reverse("conversation_list"))
+        response = self.client.get(self.list_url)
 
         self.assertEqual(response.status_code, 200)
         self.assertIn("conversations", response.context)
@@ -172,30 +281,67 @@ class ConversationViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context["active_conversation_id"], str(conv1.id))
 
+    def test_conversation_create_via_post(self):
+        """Test creating a conversation by POSTing JSON"""
+        # The test client encodes dict data itself for a JSON content type
+        response = self.client.post(
+            self.list_url,
+            data={"title": "New Conversation"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data["success"])
+        conv = Conversation.objects.get(id=data["conversation_id"])
+        self.assertEqual(conv.user, self.user)
+        self.assertEqual(conv.title, "New Conversation")
+
+    def test_conversation_create_via_post_invalid_json(self):
+        """Test that a malformed JSON body is rejected"""
+        response = self.client.post(
+            self.list_url,
+            data="{not json",
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Conversation.objects.filter(user=self.user).exists())
+
 
+@fast_password_hashers
 class HistoryViewTest(TestCase):
     """Test the history view"""
 
-    def setUp(self):
-        self.client = Client()
-        self.user = User.objects.create_user(
+    # Query budget for an authorized history request with the graph mocked out:
+    # ATOMIC_REQUESTS savepoint + release, session, user, the access check and
+    # the conversation lookup. A new query here is a regression to look at.
+    history_queries = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
             email="test@example.com",
             password="testpass123",
         )
-        self.client.login(username="test@example.com", password="testpass123")
-
-        self.conversation = Conversation.objects.create(
-            user=self.user,
+        cls.conversation = Conversation.objects.create(
+            user=cls.user,
             title="Test Conversation",
         )
+        cls.history_url = reverse(
+            "conversation_history", kwargs={"conversation_id": cls.conversation.id}
+        )
+        cls.session_id = _session_cookie_for(cls.user)
+
+    def setUp(self):
+        # The session row lives as long as the class fixtures; just present it
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = self.session_id
 
     def test_history_view_requires_login(self):
         """Test that history view requires authentication"""
         self.client.logout()
         response = self.client.get(
-            reverse(
-                "conversation_history", kwargs={"conversation_id": self.conversation.id}
-            ),
+            self.history_url,
         )
 
         # Should redirect to login
@@ -226,7 +372,7 @@ class HistoryViewTest(TestCase):
         mock_graph.get_state_history.return_value = []
 
         # Mock chat history processing
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
         mock_get_chat_history.return_value = [
             {
                 "created_at": timestamp,
@@ -250,24 +396,42 @@ class HistoryViewTest(TestCase):
             },
         ]
 
-        response = self.client.get(
-            reverse(
-                "conversation_history", kwargs={"conversation_id": self.conversation.id}
-            ),
-        )
+        with self.assertNumQueries(self.history_queries):
+            response = self.client.get(self.history_url)
 
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.content)
+        data = response.json()
         self.assertIn("messages", data)
         self.assertEqual(len(data["messages"]), 2)
 
+    @patch("sdm_platform.llmchat.views.get_postgres_checkpointer")
+    @patch("sdm_platform.llmchat.views.get_compiled_graph")
+    def test_history_view_empty_thread_skips_graph(
+        self,
+        mock_get_graph,
+        mock_get_checkpointer,
+    ):
+        """Test that a thread with no checkpoints returns no messages cheaply"""
+        mock_checkpointer_instance = MagicMock()
+        mock_checkpointer_instance.get_tuple.return_value = None
+        mock_get_checkpointer.return_value.__enter__.return_value = (
+            mock_checkpointer_instance
+        )
+
+        with self.assertNumQueries(self.history_queries):
+            response = self.client.get(self.history_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"messages": []})
+        mock_get_graph.assert_not_called()
+
 
 class FormatUtilsTest(TestCase):
     """Test the format utility functions"""
 
     def test_format_message_with_bot_role(self):
         """Test formatting a message with bot role"""
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
         result = format_message(
             role="ai",
             name="Assistant",
@@ -284,7 +448,7 @@ class FormatUtilsTest(TestCase):
 
     def test_format_message_with_user_role(self):
         """Test formatting a message with user role"""
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
         result = format_message(
             role="human",
             name="User",
@@ -297,33 +461,24 @@ class FormatUtilsTest(TestCase):
 
     def test_format_message_role_variations(self):
         """Test that various role aliases are normalized correctly"""
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
-
-        # Test bot aliases
-        for role in ["assistant", "ai", "bot"]:
-            result = format_message(
-                role=role,
-                name="Bot",
-                message="test",
-                timestamp=timestamp,
-                citations=[],
-            )
-            self.assertEqual(result["role"], "bot")
-
-        # Test user aliases
-        for role in ["human", "user"]:
-            result = format_message(
-                role=role,
-                name="User",
-                message="test",
-                timestamp=timestamp,
-                citations=[],
-            )
-            self.assertEqual(result["role"], "user")
+        common = {"name": "X", "message": "test", "timestamp": _NOW, "citations": []}
+        expected_roles = [
+            ("assistant", "bot"),
+            ("ai", "bot"),
+            ("bot", "bot"),
+            ("human", "user"),
+            ("user", "user"),
+            ("system", "unknown"),
+        ]
+
+        for role, expected in expected_roles:
+            with self.subTest(role=role):
+                result = format_message(role=role, **common)
+                self.assertEqual(result["role"], expected)
 
     def test_format_message_with_citations(self):
         """Test formatting a message with citations"""
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
         citations = [
             {
                 "index": 1,
@@ -354,27 +509,29 @@ class ChatHistoryUtilsTest(TestCase):
 
     def test_get_chat_history_with_messages(self):
         """Test getting chat history with message snapshots"""
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
 
         # Create mock snapshots representing the state evolution
         # Snapshot 1: Initial state with first human message
-        mock_snap1 = MagicMock()
-        mock_snap1.values = {
-            "messages": [HumanMessage(content="Hello")],
-            "turn_citations": [],
-        }
-        mock_snap1.created_at = timestamp.isoformat()
+        mock_snap1 = SimpleNamespace(
+            values={
+                "messages": [HumanMessage(content="Hello")],
+                "turn_citations": [],
+            },
+            created_at=timestamp.isoformat(),
+        )
 
         # Snapshot 2: State after AI responds (contains both messages)
-        mock_snap2 = MagicMock()
-        mock_snap2.values = {
-            "messages": [
-                HumanMessage(content="Hello"),
-                AIMessage(content="Hi there!"),
-            ],
-            "turn_citations": [],
-        }
-        mock_snap2.created_at = (timestamp + datetime.timedelta(seconds=1)).isoformat()
+        mock_snap2 = SimpleNamespace(
+            values={
+                "messages": [
+                    HumanMessage(content="Hello"),
+                    AIMessage(content="Hi there!"),
+                ],
+                "turn_citations": [],
+            },
+            created_at=(timestamp + datetime.timedelta(seconds=1)).isoformat(),
+        )
 
         # Pass snapshots in reverse chronological order (newest first)
         # as they would come from graph.get_state_history()
@@ -393,16 +550,17 @@ class ChatHistoryUtilsTest(TestCase):
 
     def test_get_chat_history_preserves_citations(self):
         """Test that chat history preserves turn citations"""
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
 
         citations = [{"index": 1, "doc_id": "doc123"}]
 
-        mock_snap = MagicMock()
-        mock_snap.values = {
-            "messages": [AIMessage(content="Response")],
-            "turn_citations": citations,
-        }
-        mock_snap.created_at = timestamp.isoformat()
+        mock_snap = SimpleNamespace(
+            values={
+                "messages": [AIMessage(content="Response")],
+                "turn_citations": citations,
+            },
+            created_at=timestamp.isoformat(),
+        )
 
         result = get_chat_history([mock_snap])
 
@@ -410,55 +568,181 @@ class ChatHistoryUtilsTest(TestCase):
         self.assertEqual(result[0]["turn_citations"], citations)
 
 
+class HydrateCitationsTest(TestCase):
+    """Test turning compact state citations into frontend citations."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.document = EvidenceDocument.objects.create(
+            name="Back pain guide",
+            file="documents/guide.pdf",
+        )
+        DocumentChunk.objects.bulk_create(
+            [
+                DocumentChunk(document=cls.document, chunk_index=0, text="Short"),
+                DocumentChunk(
+                    document=cls.document,
+                    chunk_index=1,
+                    text="y" * (EXCERPT_MAX_LENGTH + 1),
+                ),
+            ],
+        )
+
+    def test_hydrates_from_document_chunks(self):
+        """Test excerpts, titles and urls are filled in with a single query."""
+        doc_id = str(self.document.id)
+        legacy = {"index": 3, "doc_id": "doc123", "url": "/d/", "excerpt": "Old"}
+        citations = [
+            {"index": 1, "doc_id": doc_id, "chunk_index": 0, "score": 0.2},
+            {
+                "index": 2,
+                "doc_id": doc_id,
+                "chunk_index": 1,
+                "source_url": "https://example.com/guide",
+            },
+            legacy,
+            {"index": 4, "doc_id": "not-a-document", "chunk_index": 0},
+        ]
+
+        with self.assertNumQueries(1):
+            result = hydrate_citations(citations)
+
+        url = reverse("evidence:document_download", args=[self.document.id])
+        self.assertEqual(
+            result[0],
+            {
+                **citations[0],
+                "url": url,
+                "title": "Back pain guide",
+                "excerpt": "Short",
+            },
+        )
+        # A chunk's own source_url wins over the download link
+        self.assertEqual(result[1]["url"], "https://example.com/guide")
+        self.assertEqual(result[1]["title"], "Back pain guide")
+        self.assertEqual(result[1]["excerpt"], "y" * EXCERPT_MAX_LENGTH + "...")
+        # Citations stored before compaction already have their display fields
+        self.assertIs(result[2], legacy)
+        self.assertEqual(
+            (result[3]["url"], result[3]["title"], result[3]["excerpt"]),
+            (None, None, ""),
+        )
+
+    def test_cited_version_survives_reingest(self):
+        """Test citations keep quoting the version they were answered from."""
+        document = EvidenceDocument.objects.create(
+            name="Knee guide",
+            file="documents/knee.pdf",
+            version=2,
+        )
+        # Version 2 is shorter and reworded; version 1's rows are kept
+        DocumentChunk.objects.bulk_create(
+            [
+                DocumentChunk(document=document, version=1, chunk_index=0, text="v1 a"),
+                DocumentChunk(document=document, version=1, chunk_index=1, text="v1 b"),
+                DocumentChunk(document=document, version=1, chunk_index=2, text="v1 c"),
+                DocumentChunk(document=document, version=2, chunk_index=0, text="v2 a"),
+                DocumentChunk(document=document, version=2, chunk_index=1, text="v2 b"),
+            ],
+        )
+        doc_id = str(document.id)
+        citations = [
+            {"index": 1, "doc_id": doc_id, "version": 1, "chunk_index": 0},
+            {"index": 2, "doc_id": doc_id, "version": 1, "chunk_index": 2},
+            {"index": 3, "doc_id": doc_id, "version": 2, "chunk_index": 0},
+            # Stored before citations recorded a version: the current one
+            {"index": 4, "doc_id": doc_id, "chunk_index": 1},
+            # Cut from version 2, and never cited at that version
+            {"index": 5, "doc_id": doc_id, "version": 2, "chunk_index": 2},
+        ]
+
+        with self.assertNumQueries(1):
+            result = hydrate_citations(citations)
+
+        self.assertEqual(
+            [citation["excerpt"] for citation in result],
+            ["v1 a", "v1 c", "v2 a", "v2 b", ""],
+        )
+
+    def test_no_compact_citations_no_queries(self):
+        """Test nothing is looked up when there is nothing to hydrate."""
+        with self.assertNumQueries(0):
+            self.assertEqual(hydrate_citations([]), [])
+
+
+@fast_password_hashers
 class TasksTest(TestCase):
     """Test the Celery tasks"""
 
-    def setUp(self):
-        self.user = User.objects.create_user(
+    # Read-only message fixtures, built once. Kept as plain class attributes
+    # (not in setUpTestData) so they aren't deep-copied for every test.
+    human_hello = HumanMessage(content="Hello")
+    ai_reply = AIMessage(content="This is the AI response")
+    citations = (
+        {
+            "index": 1,
+            "doc_id": "doc123",
+            "title": "Test Document",
+            "url": "/documents/doc123/",
+        },
+    )
+
+    # Collaborator doubles, also built once; setUp resets them
+    channel_layer = MagicMock(group_send=AsyncMock())
+    checkpointer = MagicMock()
+    graph = MagicMock()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
             email="test@example.com",
             password="testpass123",
         )
-        self.conversation = Conversation.objects.create(
-            user=self.user,
+        cls.conversation = Conversation.objects.create(
+            user=cls.user,
             title="Test Conversation",
         )
 
-    @patch("sdm_platform.llmchat.tasks.async_to_sync")
-    @patch("sdm_platform.llmchat.tasks.get_channel_layer")
-    @patch("sdm_platform.llmchat.tasks.get_postgres_checkpointer")
-    @patch("sdm_platform.llmchat.tasks.get_compiled_graph")
-    def test_send_llm_reply_basic(
-        self,
-        mock_get_graph,
-        mock_get_checkpointer,
-        mock_get_channel_layer,
-        mock_async_to_sync,
-    ):
-        """Test basic LLM reply functionality"""
-        # Mock checkpointer
-        mock_checkpointer_instance = MagicMock()
-        mock_get_checkpointer.return_value.__enter__.return_value = (
-            mock_checkpointer_instance
+    def setUp(self):
+        # Everything send_llm_reply reaches outside the ORM, patched in one go
+        patcher = patch.multiple(
+            llmchat_tasks,
+            async_to_sync=DEFAULT,
+            get_channel_layer=DEFAULT,
+            get_postgres_checkpointer=DEFAULT,
+            get_compiled_graph=DEFAULT,
+        )
+        mocks = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_async_to_sync = mocks["async_to_sync"]
+        self.mock_get_channel_layer = mocks["get_channel_layer"]
+        self.mock_get_checkpointer = mocks["get_postgres_checkpointer"]
+        self.mock_get_graph = mocks["get_compiled_graph"]
+
+        # Shared doubles are reset rather than rebuilt for each test
+        for double in (self.channel_layer, self.checkpointer, self.graph):
+            double.reset_mock()
+        self.mock_get_channel_layer.return_value = self.channel_layer
+        self.mock_get_checkpointer.return_value.__enter__.return_value = (
+            self.checkpointer
         )
+        self.mock_get_graph.return_value = self.graph
 
-        # Mock graph
-        mock_graph = MagicMock()
-        mock_get_graph.return_value = mock_graph
+        # By default the channel-layer send is a no-op
+        self.mock_async_to_sync.side_effect = lambda f: lambda *args, **kwargs: None
 
-        # Mock graph response
-        ai_message = AIMessage(content="This is the AI response")
-        mock_graph.invoke.return_value = {
-            "messages": [HumanMessage(content="Hello"), ai_message],
-            "turn_citations": [],
+    def _graph_returns(self, *messages, citations=()):
+        """Make the patched graph answer a turn with ``messages``"""
+        self.graph.invoke.return_value = {
+            "messages": list(messages),
+            "turn_citations": list(citations),
         }
 
-        # Mock channel layer
-        mock_channel_layer = MagicMock()
-        mock_channel_layer.group_send = AsyncMock()
-        mock_get_channel_layer.return_value = mock_channel_layer
+    def test_send_llm_reply_basic(self):
+        """Test basic LLM reply functionality"""
+        self._graph_returns(self.human_hello, self.ai_reply)
 
-        # Mock async_to_sync to just call the function synchronously
-        mock_async_to_sync.side_effect = lambda f: lambda *args, **kwargs: None
+        updated_before = self.conversation.updated_at
 
         # Call the task - thread_name is now the conversation UUID
         send_llm_reply(
@@ -468,57 +752,22 @@ class TasksTest(TestCase):
         )
 
         # Verify the graph was invoked
-        mock_graph.invoke.assert_called_once()
+        self.graph.invoke.assert_called_once()
 
         # Verify async_to_sync was called (which wraps group_send)
-        mock_async_to_sync.assert_called_once()
+        self.mock_async_to_sync.assert_called_once()
 
-        # Verify conversation was updated
+        # Verify the conversation analytics were updated for the turn
         self.conversation.refresh_from_db()
-        # updated_at should have changed (can't test exact value due to timing)
+        self.assertEqual(self.conversation.message_count, 2)
+        self.assertIsNotNone(self.conversation.last_message_at)
+        self.assertGreater(self.conversation.updated_at, updated_before)
 
-    @patch("sdm_platform.llmchat.tasks.async_to_sync")
-    @patch("sdm_platform.llmchat.tasks.get_channel_layer")
-    @patch("sdm_platform.llmchat.tasks.get_postgres_checkpointer")
-    @patch("sdm_platform.llmchat.tasks.get_compiled_graph")
-    def test_send_llm_reply_with_citations(
-        self,
-        mock_get_graph,
-        mock_get_checkpointer,
-        mock_get_channel_layer,
-        mock_async_to_sync,
-    ):
+    def test_send_llm_reply_with_citations(self):
         """Test LLM reply with citations"""
-        # Mock checkpointer
-        mock_checkpointer_instance = MagicMock()
-        mock_get_checkpointer.return_value.__enter__.return_value = (
-            mock_checkpointer_instance
-        )
-
-        # Mock graph
-        mock_graph = MagicMock()
-        mock_get_graph.return_value = mock_graph
-
         # Mock graph response with citations
-        citations = [
-            {
-                "index": 1,
-                "doc_id": "doc123",
-                "title": "Test Document",
-                "url": "/documents/doc123/",
-            },
-        ]
-
         ai_message = AIMessage(content="Based on [1]...")
-        mock_graph.invoke.return_value = {
-            "messages": [HumanMessage(content="Hello"), ai_message],
-            "turn_citations": citations,
-        }
-
-        # Mock channel layer
-        mock_channel_layer = MagicMock()
-        mock_channel_layer.group_send = AsyncMock()
-        mock_get_channel_layer.return_value = mock_channel_layer
+        self._graph_returns(self.human_hello, ai_message, citations=self.citations)
 
         # Capture the call arguments
         captured_args = []
@@ -529,7 +778,7 @@ class TasksTest(TestCase):
 
             return wrapper
 
-        mock_async_to_sync.side_effect = capture_call
+        self.mock_async_to_sync.side_effect = capture_call
 
         # Call the task - thread_name is now the conversation UUID
         send_llm_reply(
@@ -541,41 +790,17 @@ class TasksTest(TestCase):
         # Verify async_to_sync was called
         self.assertEqual(len(captured_args), 1)
 
-    @patch("sdm_platform.llmchat.tasks.async_to_sync")
-    @patch("sdm_platform.llmchat.tasks.get_channel_layer")
-    @patch("sdm_platform.llmchat.tasks.get_postgres_checkpointer")
-    @patch("sdm_platform.llmchat.tasks.get_compiled_graph")
-    def test_send_llm_reply_no_ai_response(
-        self,
-        mock_get_graph,
-        mock_get_checkpointer,
-        mock_get_channel_layer,
-        mock_async_to_sync,
-    ):
-        """Test when LLM doesn't return an AI message"""
-        # Mock checkpointer
-        mock_checkpointer_instance = MagicMock()
-        mock_get_checkpointer.return_value.__enter__.return_value = (
-            mock_checkpointer_instance
-        )
-
-        # Mock graph
-        mock_graph = MagicMock()
-        mock_get_graph.return_value = mock_graph
+        # The reply goes through the channel layer as a dict, not a JSON string
+        group, event = captured_args[0][0]
+        self.assertEqual(group, str(self.conversation.id))
+        self.assertEqual(event["type"], "chat.reply")
+        self.assertEqual(event["payload"]["content"], "Based on [1]...")
+        self.assertEqual(event["payload"]["citations"], list(self.citations))
 
+    def test_send_llm_reply_no_ai_response(self):
+        """Test when LLM doesn't return an AI message"""
         # Mock graph response without AI message
-        mock_graph.invoke.return_value = {
-            "messages": [HumanMessage(content="Hello")],
-            "turn_citations": [],
-        }
-
-        # Mock channel layer
-        mock_channel_layer = MagicMock()
-        mock_channel_layer.group_send = AsyncMock()
-        mock_get_channel_layer.return_value = mock_channel_layer
-
-        # Mock async_to_sync
-        mock_async_to_sync.side_effect = lambda f: lambda *args, **kwargs: None
+        self._graph_returns(self.human_hello)
 
         # Call the task - thread_name is now the conversation UUID
         send_llm_reply(
@@ -585,7 +810,7 @@ class TasksTest(TestCase):
         )
 
         # Verify async_to_sync was NOT called (no AI response)
-        mock_async_to_sync.assert_not_called()
+        self.mock_async_to_sync.assert_not_called()
 
 
 class URLConfigTest(TestCase):
@@ -610,84 +835,109 @@ class URLConfigTest(TestCase):
         self.assertEqual(url, f"/conversation/{test_uuid}/history/")
 
 
-class ChatConsumerTest(TransactionTestCase):
-    """Test the WebSocket ChatConsumer - uses TransactionTestCase for async support"""
+@fast_password_hashers
+@in_memory_channel_layer
+class ChatConsumerTest(TestCase):
+    """
+    Test the WebSocket ChatConsumer.
 
-    def setUp(self):
-        self.user = User.objects.create_user(
+    The consumer itself never touches the database, and the async ORM calls
+    made by the tests run on the test's own connection, so the per-test
+    rollback of TestCase is enough; no table truncation needed.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The class's settings overrides are active by now, so this is the
+        # in-memory layer the consumers under test will also get
+        cls.channel_layer = get_channel_layer()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
             email="test@example.com",
             password="testpass123",
         )
-        self.conversation = Conversation.objects.create(
-            user=self.user,
+        cls.conversation = Conversation.objects.create(
+            user=cls.user,
             title="Test Conversation",
         )
 
-    @patch("sdm_platform.llmchat.consumers.send_llm_reply")
-    async def test_consumer_connect(self, mock_send_llm_reply):
-        """Test WebSocket connection"""
-
-        # Get user and conversation in async-safe way
-        @database_sync_to_async
-        def get_user_and_conv():
-            user = User.objects.get(email="test@example.com")
-            conv = Conversation.objects.get(user=user)
-            return user, conv.id
-
-        user, conv_id = await get_user_and_conv()
-
-        # Create communicator with user in scope
-        communicator = WebsocketCommunicator(
-            ChatConsumer.as_asgi(),
-            f"/ws/chat/{conv_id}/",
+    def setUp(self):
+        # No test here should reach Celery
+        patcher = patch("sdm_platform.llmchat.consumers.send_llm_reply")
+        self.mock_send_llm_reply = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _make_consumer(self, conversation_id=None):
+        """
+        Build a ChatConsumer with mocked transport and channel layer.
+
+        Lets receive-logic tests call the handlers directly, without the ASGI
+        handshake or a real channel layer.
+        """
+        route_kwargs = {"conversation_id": conversation_id} if conversation_id else {}
+        consumer = ChatConsumer()
+        consumer.scope = {"user": self.user, "url_route": {"kwargs": route_kwargs}}
+        consumer.channel_name = "test-channel"
+        consumer.channel_layer = MagicMock(
+            group_add=AsyncMock(),
+            group_send=AsyncMock(),
+            group_discard=AsyncMock(),
         )
-        communicator.scope["user"] = user
-        communicator.scope["url_route"] = {
-            "kwargs": {"conversation_id": conv_id},
-        }
+        consumer.accept = AsyncMock()
+        consumer.send_json = AsyncMock()
+        return consumer
+
+    @asynccontextmanager
+    async def _connected(self, conversation_id=None):
+        """
+        Connect a communicator for the test user, optionally for a conversation.
+
+        The consumer only reads the scope user's email, so the class fixture is
+        put in the scope as-is instead of being re-fetched in the async test.
+        The socket is disconnected again when the block exits.
+        """
+        if conversation_id:
+            path = f"/ws/chat/{conversation_id}/"
+            route_kwargs = {"conversation_id": conversation_id}
+        else:
+            path = "/ws/chat/"
+            route_kwargs = {}
 
-        # Connect
+        communicator = WebsocketCommunicator(_CHAT_ASGI, path)
+        communicator.scope["user"] = self.user
+        communicator.scope["url_route"] = {"kwargs": route_kwargs}
         connected, _ = await communicator.connect()
         self.assertTrue(connected)
+        try:
+            yield communicator
+        finally:
+            await communicator.disconnect()
 
-        # Disconnect
-        await communicator.disconnect()
+    async def test_consumer_connect(self):
+        """Test WebSocket connection"""
+        # Connects (asserting the handshake is accepted) and disconnects
+        async with self._connected(self.conversation.id):
+            pass
 
-    @patch("sdm_platform.llmchat.consumers.send_llm_reply")
-    async def test_consumer_receive_message(self, mock_send_llm_reply):
+    async def test_consumer_receive_message(self):
         """Test receiving a message through WebSocket"""
-
-        # Get user and conversation in async-safe way
-        @database_sync_to_async
-        def get_user_and_conv():
-            user = User.objects.get(email="test@example.com")
-            conv = Conversation.objects.get(user=user)
-            return user, conv.id
-
-        user, conv_id = await get_user_and_conv()
-
-        # Create communicator
-        communicator = WebsocketCommunicator(
-            ChatConsumer.as_asgi(),
-            f"/ws/chat/{conv_id}/",
-        )
-        communicator.scope["user"] = user
-        communicator.scope["url_route"] = {
-            "kwargs": {"conversation_id": conv_id},
-        }
-
-        # Connect
-        await communicator.connect()
+        conv_id = self.conversation.id
+        consumer = self._make_consumer(conv_id)
+        await consumer.connect()
 
         # Send a message
-        await communicator.send_json_to(
-            {
-                "message": "Hello, bot!",
-            }
-        )
+        await consumer.receive_json({"message": "Hello, bot!"})
 
-        # Receive the echo
-        response = await communicator.receive_json_from()
+        # The message is broadcast to the conversation group...
+        event = {"type": "chat.message", "message": "Hello, bot!"}
+        consumer.channel_layer.group_send.assert_awaited_once_with(str(conv_id), event)
+
+        # ...and echoed back to the socket when the group delivers it
+        await consumer.chat_message(event)
+        response = consumer.send_json.call_args[0][0]
 
         # Verify response structure
         self.assertEqual(response["role"], "user")
@@ -697,176 +947,77 @@ class ChatConsumerTest(TransactionTestCase):
         self.assertEqual(response["citations"], [])
 
         # Verify Celery task was called with the UUID as thread_name
-        mock_send_llm_reply.delay.assert_called_once_with(
+        self.mock_send_llm_reply.delay.assert_called_once_with(
             str(conv_id),
             "test@example.com",
             "Hello, bot!",
         )
 
-        # Disconnect
-        await communicator.disconnect()
-
-    @patch("sdm_platform.llmchat.consumers.send_llm_reply")
-    async def test_consumer_ping_pong(self, mock_send_llm_reply):
+    async def test_consumer_ping_pong(self):
         """Test ping/pong functionality"""
-
-        # Get user and conversation in async-safe way
-        @database_sync_to_async
-        def get_user_and_conv():
-            user = User.objects.get(email="test@example.com")
-            conv = Conversation.objects.get(user=user)
-            return user, conv.id
-
-        user, conv_id = await get_user_and_conv()
-
-        # Create communicator
-        communicator = WebsocketCommunicator(
-            ChatConsumer.as_asgi(),
-            f"/ws/chat/{conv_id}/",
-        )
-        communicator.scope["user"] = user
-        communicator.scope["url_route"] = {
-            "kwargs": {"conversation_id": conv_id},
-        }
-
-        # Connect
-        await communicator.connect()
+        consumer = self._make_consumer(self.conversation.id)
+        await consumer.connect()
 
         # Send a ping
-        await communicator.send_json_to(
-            {
-                "type": "ping",
-            }
-        )
+        await consumer.receive_json({"type": "ping"})
 
         # Receive pong
-        response = await communicator.receive_json_from()
-        self.assertEqual(response["type"], "pong")
+        consumer.send_json.assert_awaited_once_with({"type": "pong"})
 
         # Verify Celery task was NOT called for ping
-        mock_send_llm_reply.delay.assert_not_called()
-
-        # Disconnect
-        await communicator.disconnect()
+        self.mock_send_llm_reply.delay.assert_not_called()
 
-    @patch("sdm_platform.llmchat.consumers.send_llm_reply")
-    async def test_consumer_without_conversation_id(self, mock_send_llm_reply):
+    async def test_consumer_without_conversation_id(self):
         """Test WebSocket connection without conversation_id"""
-
-        # Get user in async-safe way
-        @database_sync_to_async
-        def get_user():
-            return User.objects.get(email="test@example.com")
-
-        user = await get_user()
-
-        # Create communicator without conversation_id
-        communicator = WebsocketCommunicator(
-            ChatConsumer.as_asgi(),
-            "/ws/chat/",
-        )
-        communicator.scope["user"] = user
-        communicator.scope["url_route"] = {
-            "kwargs": {},  # No conversation_id
-        }
-
-        # Connect
-        connected, _ = await communicator.connect()
-        self.assertTrue(connected)
+        consumer = self._make_consumer()
+        await consumer.connect()
+        consumer.accept.assert_awaited_once()
 
         # Send a message
-        await communicator.send_json_to(
-            {
-                "message": "Hello!",
-            }
-        )
-
-        # Receive the echo
-        response = await communicator.receive_json_from()
-        self.assertEqual(response["role"], "user")
+        await consumer.receive_json({"message": "Hello!"})
 
         # Verify task was called with fallback thread name
-        mock_send_llm_reply.delay.assert_called_once()
-        call_args = mock_send_llm_reply.delay.call_args[0]
+        self.mock_send_llm_reply.delay.assert_called_once()
+        call_args = self.mock_send_llm_reply.delay.call_args[0]
         self.assertIn("NoThreadID", call_args[0])
 
-        # Disconnect
-        await communicator.disconnect()
-
-    @patch("sdm_platform.llmchat.consumers.send_llm_reply")
-    async def test_consumer_chat_reply(self, mock_send_llm_reply):
+    async def test_consumer_chat_reply(self):
         """Test receiving a bot reply through the consumer"""
-
-        # Get user and conversation in async-safe way
-        @database_sync_to_async
-        def get_user_and_conv():
-            user = User.objects.get(email="test@example.com")
-            conv = Conversation.objects.get(user=user)
-            return user, conv.id
-
-        user, conv_id = await get_user_and_conv()
-
-        # Create communicator
-        communicator = WebsocketCommunicator(
-            ChatConsumer.as_asgi(),
-            f"/ws/chat/{conv_id}/",
-        )
-        communicator.scope["user"] = user
-        communicator.scope["url_route"] = {
-            "kwargs": {"conversation_id": conv_id},
-        }
-
-        # Connect
-        await communicator.connect()
+        conv_id = self.conversation.id
 
         # Simulate a bot reply being sent to the group
         # This would normally come from the Celery task
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
-        bot_message = format_message(
-            role="bot",
-            name=settings.AI_ASSISTANT_NAME,
-            message="This is the bot response",
-            timestamp=timestamp,
-            citations=[],
-        )
+        bot_message = _BOT_REPLY_PAYLOAD
 
-        # Get the channel layer directly
-        # thread_name is now just the UUID string
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            await channel_layer.group_send(
+        # Guard against the class override being lost and the test hitting Redis
+        self.assertIsInstance(self.channel_layer, InMemoryChannelLayer)
+
+        async with self._connected(conv_id) as communicator:
+            # thread_name is now just the UUID string
+            await self.channel_layer.group_send(
                 str(conv_id),
                 {
                     "type": "chat.reply",
-                    "content": json.dumps(bot_message),
+                    "payload": bot_message,
                 },
             )
-        else:
-            self.assertIsNotNone(channel_layer)
 
-        # Receive the bot response
-        response = await communicator.receive_json_from()
+            # Receive the bot response
+            response = await communicator.receive_json_from()
+
         self.assertEqual(response["role"], "bot")
         self.assertEqual(response["content"], "This is the bot response")
-        self.assertEqual(response["name"], settings.AI_ASSISTANT_NAME)
-
-        # Disconnect
-        await communicator.disconnect()
+        self.assertEqual(response["name"], _AI_NAME)
 
 
-class ChatConsumerUtilsTest(TestCase):
-    """Test utility functions used by ChatConsumer - uses regular TestCase"""
-
-    def setUp(self):
-        self.user = User.objects.create_user(
-            email="test@example.com",
-            password="testpass123",
-        )
+class ChatConsumerUtilsTest(SimpleTestCase):
+    """Test utility functions used by ChatConsumer - no database needed"""
 
     def test_get_useremail_from_scope_with_user(self):
         """Test extracting user email from scope"""
 
-        scope = {"user": self.user}
+        # Only .email is read, so an unsaved user is enough
+        scope = {"user": User(email="test@example.com")}
         result = get_useremail_from_scope(scope)
         self.assertEqual(result, "test@example.com")
 
@@ -886,216 +1037,641 @@ class ChatConsumerUtilsTest(TestCase):
         self.assertEqual(result, "Anonymous")
 
 
-class GraphWithMemoryTest(TestCase):
-    """Test LangGraph integration with memory module."""
+class _FakeChatModel:
+    """Chat model double: returns a canned reply and records each call"""
 
-    def setUp(self):
-        """Set up test fixtures."""
-        self.user = User.objects.create_user(
-            email="memory_test@example.com",
-            password="testpass123",
+    def __init__(self, response=None):
+        self.response = response
+        self.calls = []
+
+    def reset(self):
+        self.calls.clear()
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def invoke(self, messages, *args, **kwargs):
+        self.calls.append((messages, args, kwargs))
+        return self.response
+
+
+class _FakeEmbeddings:
+    """Embeddings double: records each embedded query"""
+
+    def __init__(self):
+        self.queries = []
+
+    def reset(self):
+        self.queries.clear()
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text))]
+
+
+class _StubVectorStore:
+    """
+    Stand-in for a langchain Chroma store with canned search results.
+
+    Answers repeated (vector, k) searches from a memo, the way a query cache in
+    front of the real store would, and records each call for assertions.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.results = []
+        self.calls = []
+        self._memo = {}
+
+    def set_results(self, docs_and_scores):
+        self.results = list(docs_and_scores)
+        self._memo.clear()
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding, k=4, **kwargs
+    ):
+        self.calls.append((embedding, k, kwargs))
+        key = (tuple(embedding), k)
+        if key not in self._memo:
+            self._memo[key] = self.results[:k]
+        return self._memo[key]
+
+
+# Initial non-message graph state for a new turn; the graph only replaces
+# these values, never mutates them, so one copy is shared by every invoke
+_EMPTY_STATE = {"user_context": "", "system_prompt": "", "turn_citations": []}
+
+# Chroma client stand-ins; retrieval only lists collections and reads their names
+_NO_COLLECTIONS_CLIENT = SimpleNamespace(list_collections=list)
+_ONE_COLLECTION_CLIENT = SimpleNamespace(
+    list_collections=lambda: [SimpleNamespace(name="test_collection")],
+)
+
+# Evidence chunk the RAG scenario's vector search returns
+_EVIDENCE_DOC = Document(
+    page_content="This is test evidence content.",
+    metadata={
+        "document_id": "test_doc_1",
+        "chunk_index": 0,
+        "page": 1,
+    },
+)
+
+
+@dataclass(frozen=True)
+class _GraphCase:
+    """One GraphWithMemoryTest scenario: a single graph turn for one user"""
+
+    name: str
+    user_id: str
+    message: str
+    # (Document, distance) pairs the vector search returns; empty means no RAG
+    docs: tuple = ()
+    # Snippets expected in the resulting user_context; () means it must be
+    # empty and None means it isn't checked
+    user_context: tuple | None = None
+    # Snippets expected in the system message the model receives
+    system_message: tuple = ()
+
+
+class GraphWithMemoryTest(TestCase):
+    """
+    Test LangGraph integration with memory module.
+
+    Each scenario is its own test with its own thread id, and every process
+    builds its own in-memory checkpointer and store, so the tests are safe to
+    spread across workers (e.g. ``manage.py test --parallel`` or pytest-xdist's
+    ``pytest -n 3 sdm_platform/llmchat/tests.py::GraphWithMemoryTest``).
+    """
+
+    # The graph only needs a user id to find a profile; no User rows required
+    profile_user_id = "memory_test@example.com"
+    rag_user_id = "memory_rag_test@example.com"
+
+    cases = {
+        case.name: case
+        for case in (
+            # Profile is loaded into user_context even when the LLM isn't called
+            _GraphCase(
+                name="loads_profile_context",
+                user_id=profile_user_id,
+                message="Hello, what's my name?",
+                user_context=("USER CONTEXT:", "Jane", "prefers to be called"),
+            ),
+            # With evidence retrieved, the profile is part of the system message
+            # (a distance of 0.3 is below RAG_MAX_DISTANCE so the doc is kept)
+            _GraphCase(
+                name="profile_in_rag_system_message",
+                user_id=rag_user_id,
+                message="@llm What treatment options exist?",
+                docs=((_EVIDENCE_DOC, 0.3),),
+                system_message=("USER CONTEXT:", "Bob", "June 20"),
+            ),
+            # Long chunks are cut down before they are quoted as evidence
+            _GraphCase(
+                name="long_evidence_truncated",
+                user_id="nonexistent@example.com",
+                message="@llm Tell me everything",
+                docs=((Document(page_content="x" * 900), 0.3),),
+                system_message=("x" * 800 + "...",),
+            ),
+            # No profile: empty context, but the turn still completes
+            _GraphCase(
+                name="works_without_profile",
+                user_id="nonexistent@example.com",
+                message="@llm Hello",
+                user_context=(),
+            ),
+        )
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        resources = ExitStack()
+        cls.addClassCleanup(resources.close)
+
+        # The graph captures its model and embeddings when it is compiled, so
+        # they are patched for the whole class rather than per test. They and
+        # the compiled graphs are cached per process; start and finish with
+        # empty caches so the fakes neither miss nor outlive the patches.
+        for clear_cache in (
+            _init_chat_model.cache_clear,
+            _init_embeddings.cache_clear,
+            _COMPILED_GRAPHS.clear,
+        ):
+            clear_cache()
+            resources.callback(clear_cache)
+        cls.fake_model = _FakeChatModel()
+        resources.enter_context(
+            patch(
+                "sdm_platform.llmchat.utils.graphs.base.init_chat_model",
+                return_value=cls.fake_model,
+            )
+        )
+        cls.embeddings = _FakeEmbeddings()
+        resources.enter_context(
+            patch(
+                "sdm_platform.llmchat.utils.graphs.base.init_embeddings",
+                return_value=cls.embeddings,
+            )
+        )
+        cls.mock_chroma = resources.enter_context(
+            patch("sdm_platform.llmchat.utils.graphs.nodes.retrieval.get_chroma_client")
+        )
+        cls.vector_store = _StubVectorStore()
+        resources.enter_context(
+            patch(
+                "sdm_platform.llmchat.utils.graphs.nodes.retrieval.Chroma",
+                return_value=cls.vector_store,
+            )
         )
 
-    @patch("sdm_platform.llmchat.utils.graphs.base.init_chat_model")
-    @patch("sdm_platform.llmchat.utils.graphs.nodes.retrieval.get_chroma_client")
-    def test_graph_loads_user_profile_context(self, mock_chroma, mock_init_model):
-        """Test that the graph loads user profile and includes it in context."""
-        # Create a user profile
-        with get_memory_store() as store:
-            UserProfileManager.update_profile(
-                user_id=self.user.email,
-                updates={
+        # These tests cover graph logic, not persistence: run against in-memory
+        # backends unless the Postgres integration path is asked for explicitly
+        if os.environ.get("LLMCHAT_POSTGRES_TESTS"):
+            cls.checkpointer = resources.enter_context(get_postgres_checkpointer())
+            cls.store = resources.enter_context(get_memory_store())
+        else:
+            cls.checkpointer = InMemorySaver()
+            cls.store = InMemoryStore()
+        cls.graph = get_compiled_graph(cls.checkpointer, store=cls.store)
+
+        # Profiles the tests read, written in one batch for the class
+        UserProfileManager.update_profiles_bulk(
+            {
+                cls.profile_user_id: {
                     "name": "Jane Doe",
                     "preferred_name": "Jane",
                     "birthday": date(1985, 3, 15),
                 },
-                store=store,
-                source="user_input",
-            )
-
-        # Mock the LLM to return a proper AIMessage
-        mock_model = MagicMock()
-        mock_model.invoke.return_value = AIMessage(content="Hello! How can I help you?")
-        mock_init_model.return_value = mock_model
+                cls.rag_user_id: {
+                    "preferred_name": "Bob",
+                    "birthday": date(1990, 6, 20),
+                },
+            },
+            store=cls.store,
+            source="user_input",
+        )
 
-        # Mock Chroma to avoid actual vector search
-        mock_chroma.return_value = MagicMock()
+    def setUp(self):
+        """Set up test fixtures."""
+        self.fake_model.reset()
+        self.embeddings.reset()
+        self.mock_chroma.reset_mock()
+        self.vector_store.reset()
+        _COLLECTIONS_CACHE.clear()
+        _VECTOR_STORES.clear()
+
+    def test_graph_loads_profile_context(self):
+        """Test that the stored profile is loaded into user_context."""
+        self._run_graph_case(self.cases["loads_profile_context"])
+
+    def test_graph_profile_in_rag_system_message(self):
+        """Test that the profile reaches the system message on the RAG path."""
+        self._run_graph_case(self.cases["profile_in_rag_system_message"])
+
+    def test_graph_truncates_long_evidence(self):
+        """Test long evidence chunks are truncated in the system message."""
+        self._run_graph_case(self.cases["long_evidence_truncated"])
+
+    def test_graph_works_without_profile(self):
+        """Test that a user without a profile still gets a reply."""
+        self._run_graph_case(self.cases["works_without_profile"])
+
+    def _run_graph_case(self, case):
+        """Invoke the shared graph for one _GraphCase and check its expectations"""
+        self.fake_model.reset()
+        self.fake_model.response = AIMessage(content="I can help!")
+
+        # Only expose a collection when the case has documents to retrieve
+        self.mock_chroma.return_value = (
+            _ONE_COLLECTION_CLIENT if case.docs else _NO_COLLECTIONS_CLIENT
+        )
+        self.vector_store.set_results(case.docs)
+        self.embeddings.reset()
 
-        # Build the graph with store
-        with get_postgres_checkpointer() as checkpointer, get_memory_store() as store:
-            graph = get_compiled_graph(checkpointer, store=store)
+        config = RunnableConfig(
+            configurable={
+                "thread_id": f"test_thread_{case.name}",
+                "user_id": case.user_id,
+            },
+        )
+        # A fresh HumanMessage per turn: add_messages assigns ids in place, so
+        # message objects can't be shared between invocations
+        result = self.graph.invoke(
+            {"messages": [HumanMessage(content=case.message)], **_EMPTY_STATE},
+            config,
+        )
 
-            # Invoke the graph with user_id in config
-            config = RunnableConfig(
-                configurable={
-                    "thread_id": "test_thread_memory",
-                    "user_id": self.user.email,
-                },
+        if case.user_context is not None:
+            if case.user_context:
+                for snippet in case.user_context:
+                    self.assertIn(snippet, result["user_context"])
+            else:
+                self.assertEqual(result["user_context"], "")
+
+        if case.message.startswith("@llm"):
+            # The turn went through the model and came back with its reply
+            self.assertTrue(self.fake_model.calls)
+            self.assertGreaterEqual(len(result["messages"]), 1)
+
+        if case.system_message:
+            messages = self.fake_model.calls[-1][0]
+            system_message = next((m for m in messages if m.type == "system"), None)
+            self.assertIsNotNone(system_message)
+            for snippet in case.system_message:
+                self.assertIn(snippet, system_message.content)
+
+        if case.docs:
+            # The query is embedded once and the vector reused per collection
+            self.assertEqual(self.embeddings.queries, [case.message])
+            self.assertEqual(
+                [call[0] for call in self.vector_store.calls],
+                [[float(len(case.message))]],
             )
 
-            result = graph.invoke(
-                {
-                    "messages": [
-                        HumanMessage(content="Hello, what's my name?"),
-                    ],
-                    "user_context": "",
-                    "system_prompt": "",
-                    "turn_citations": [],
-                },
-                config,
+
+class RetrieveTopKFromCollectionsTest(SimpleTestCase):
+    """Test merging per-collection Chroma results in the retrieval node."""
+
+    def setUp(self):
+        self.docs = {name: Document(page_content=name) for name in "abcd"}
+        _VECTOR_STORES.clear()
+        self.addCleanup(_VECTOR_STORES.clear)
+
+    def _patch_collections(self, results):
+        """
+        Make each collection answer with results[name] (or raise it).
+
+        Returns a dict that collects each collection's search mock by name.
+        """
+        searches = {}
+
+        def make_store(*, collection_name, **kwargs):
+            store = MagicMock()
+            search = store.similarity_search_by_vector_with_relevance_scores
+            searches[collection_name] = search
+            outcome = results[collection_name]
+            if isinstance(outcome, Exception):
+                search.side_effect = outcome
+            else:
+                search.return_value = outcome
+            return store
+
+        patcher = patch.object(retrieval, "Chroma", side_effect=make_store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return searches
+
+    def test_vector_stores_reused_per_client(self):
+        """Test a collection's wrapper is built once per Chroma client."""
+        self._patch_collections({"doc_1": [], "doc_2": []})
+        client = MagicMock()
+
+        def search(chroma_client):
+            _retrieve_top_k_from_collections(
+                client=chroma_client,
+                query_vector=[0.1],
+                collections=["doc_1", "doc_2"],
             )
 
-        # Verify user_context was populated
-        self.assertIn("user_context", result)
-        user_context = result["user_context"]
+        search(client)
+        search(client)
+        self.assertEqual(retrieval.Chroma.call_count, 2)
 
-        # The context should contain the user's preferred name
-        self.assertIn("USER CONTEXT:", user_context)
-        self.assertIn("Jane", user_context)
-        self.assertIn("prefers to be called", user_context)
+        search(MagicMock())
+        self.assertEqual(retrieval.Chroma.call_count, 4)
 
-    @patch("sdm_platform.llmchat.utils.graphs.base.init_chat_model")
-    @patch("sdm_platform.llmchat.utils.graphs.nodes.retrieval.get_chroma_client")
-    def test_graph_includes_profile_in_rag_system_message(
-        self, mock_chroma, mock_init_model
-    ):
-        """Test that user profile is included in RAG system message."""
-        # Create a user profile
-        with get_memory_store() as store:
-            UserProfileManager.update_profile(
-                user_id=self.user.email,
-                updates={
-                    "preferred_name": "Bob",
-                    "birthday": date(1990, 6, 20),
-                },
-                store=store,
-            )
+    def test_failed_search_rebuilds_vector_store(self):
+        """Test a wrapper is rebuilt after its collection fails a search."""
+        self._patch_collections({"doc_1": RuntimeError("collection deleted")})
+        client = MagicMock()
+
+        for _ in range(2):
+            with self.assertLogs(retrieval.logger, "ERROR"):
+                _retrieve_top_k_from_collections(
+                    client=client,
+                    query_vector=[0.1],
+                    collections=["doc_1"],
+                )
+
+        self.assertEqual(retrieval.Chroma.call_count, 2)
+        self.assertNotIn("doc_1", _VECTOR_STORES)
+
+    def test_single_collection_asked_for_full_top_k(self):
+        """Test one collection is queried for max_total_k, not per_collection_k."""
+        searches = self._patch_collections({GLOBAL_COLLECTION: []})
 
-        # Mock the LLM to return a proper AIMessage
-        mock_model = MagicMock()
-        mock_model.invoke.return_value = AIMessage(content="I can help with that!")
-        mock_init_model.return_value = mock_model
-
-        # Mock Chroma with fake documents to trigger RAG path
-        mock_client = MagicMock()
-        mock_collection = MagicMock()
-        mock_collection.name = "test_collection"
-        mock_client.list_collections.return_value = [mock_collection]
-
-        # Mock Chroma vector store to return fake documents
-        mock_vs = MagicMock()
-        fake_doc = Document(
-            page_content="This is test evidence content.",
-            metadata={
-                "document_id": "test_doc_1",
-                "chunk_index": 0,
-                "page": 1,
+        _retrieve_top_k_from_collections(
+            client=MagicMock(),
+            query_vector=[0.1, 0.2],
+            collections=[GLOBAL_COLLECTION],
+            per_collection_k=2,
+            max_total_k=5,
+        )
+
+        searches[GLOBAL_COLLECTION].assert_called_once_with([0.1, 0.2], k=5)
+
+    def test_global_collection_asked_for_full_top_k(self):
+        """Test legacy collections don't cap the shared collection's results."""
+        searches = self._patch_collections({GLOBAL_COLLECTION: [], "doc_1": []})
+
+        _retrieve_top_k_from_collections(
+            client=MagicMock(),
+            query_vector=[0.1, 0.2],
+            collections=[GLOBAL_COLLECTION, "doc_1"],
+            per_collection_k=2,
+            max_total_k=5,
+        )
+
+        searches[GLOBAL_COLLECTION].assert_called_once_with([0.1, 0.2], k=5)
+        searches["doc_1"].assert_called_once_with([0.1, 0.2], k=2)
+
+    @override_settings(RAG_MAX_DISTANCE=1.0)
+    def test_merges_collections_by_distance(self):
+        """Test results are filtered, merged across collections and ranked."""
+        docs = self.docs
+        self._patch_collections(
+            {
+                "doc_1": [(docs["a"], 0.4), (docs["b"], 1.5)],
+                "doc_2": RuntimeError("collection unavailable"),
+                "doc_3": [(docs["c"], 0.1), (docs["d"], 0.4)],
             },
         )
-        # similarity_search_with_score returns (Document, score) tuples
-        # Score of 0.3 is below MAX_DISTANCE_METRIC (0.5) so it will be included
-        mock_vs.similarity_search_with_score.return_value = [(fake_doc, 0.3)]
 
-        # Patch Chroma constructor to return our mock
-        mock_chroma.return_value = mock_client
+        # A failing collection is logged and skipped, not fatal
+        with self.assertLogs(retrieval.logger, "ERROR"):
+            result = _retrieve_top_k_from_collections(
+                client=MagicMock(),
+                query_vector=[0.1, 0.2],
+                collections=["doc_1", "doc_2", "doc_3"],
+                max_total_k=5,
+            )
+
+        # Ascending distance; ties keep collection order. "b" is too far away.
+        self.assertEqual(
+            result,
+            [
+                (docs["c"], 0.1, "doc_3"),
+                (docs["a"], 0.4, "doc_1"),
+                (docs["d"], 0.4, "doc_3"),
+            ],
+        )
+
+
+class SearchEvidenceTest(SimpleTestCase):
+    """Test embedding the query and searching for evidence."""
 
-        with patch(
-            "sdm_platform.llmchat.utils.graphs.nodes.retrieval.Chroma",
-            return_value=mock_vs,
+    def setUp(self):
+        _COLLECTIONS_CACHE.clear()
+        self.addCleanup(_COLLECTIONS_CACHE.clear)
+        patcher = patch.object(
+            retrieval,
+            "get_chroma_client",
+            return_value=_ONE_COLLECTION_CLIENT,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_embedding_error_yields_no_evidence(self):
+        """Test a failing embeddings API is logged and the turn goes on."""
+        embeddings = MagicMock()
+        embeddings.embed_query.side_effect = RuntimeError("embeddings unavailable")
+
+        with (
+            patch.object(retrieval, "_retrieve_top_k_from_collections") as search,
+            self.assertLogs(retrieval.logger, "ERROR"),
         ):
-            # Build the graph
-            with (
-                get_postgres_checkpointer() as checkpointer,
-                get_memory_store() as store,
-            ):
-                graph = get_compiled_graph(checkpointer, store=store)
-
-                config = RunnableConfig(
-                    configurable={
-                        "thread_id": "test_thread_rag_memory",
-                        "user_id": self.user.email,
-                    },
-                )
+            result = _search_evidence(embeddings, "What are my options?", None)
 
-                # Send a message with @llm prefix to trigger RAG
-                _ = graph.invoke(
-                    {
-                        "messages": [
-                            HumanMessage(content="@llm What treatment options exist?"),
-                        ],
-                        "user_context": "",
-                        "system_prompt": "",
-                        "turn_citations": [],
-                    },
-                    config,
+        self.assertEqual(result, [])
+        search.assert_not_called()
+
+
+class BuildSystemMessageTest(SimpleTestCase):
+    """Test the system message added before the model is called."""
+
+    def setUp(self):
+        _render_system_content.cache_clear()
+
+    def test_system_message_sections_in_order(self):
+        """Test context sections are joined in a fixed order."""
+        result = _build_system_message_and_continue(
+            user_context="USER",
+            system_prompt="PROMPT",
+            turn_citations=[],
+            evidence_lines=["[1] excerpt"],
+            aids_context="AIDS",
+        )
+
+        # Only the new system message is written; add_messages keeps the history
+        (system_msg,) = result["messages"]
+        self.assertEqual(
+            set(result),
+            {"messages", "next_state", "turn_citations", "turn_decision_aids"},
+        )
+        content = system_msg["content"]
+        positions = [
+            content.index(part)
+            for part in (GLOBAL_INSTRUCTIONS, "PROMPT", "USER", "[1] excerpt", "AIDS")
+        ]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_unchanged_context_reuses_rendered_content(self):
+        """Test a repeat turn with the same context skips re-rendering."""
+        for _ in range(2):
+            _build_system_message_and_continue("USER", "PROMPT", [])
+
+        info = _render_system_content.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 1))
+
+
+class PromptMessagesTest(SimpleTestCase):
+    """Test windowing the history sent to the chat model."""
+
+    history = [
+        HumanMessage(content="a" * 400),
+        AIMessage(content="b" * 400),
+        HumanMessage(content="c" * 40),
+        SystemMessage(content="d" * 40),
+    ]
+
+    @override_settings(LLM_MAX_PROMPT_TOKENS=40)
+    def test_keeps_most_recent_turns_within_budget(self):
+        """Test older messages are dropped once the budget is spent."""
+        self.assertEqual(_prompt_messages(self.history), self.history[2:])
+
+    @override_settings(LLM_MAX_PROMPT_TOKENS=5)
+    def test_sends_latest_turn_when_it_is_over_budget(self):
+        """Test the latest human turn is always sent, even over budget."""
+        self.assertEqual(_prompt_messages(self.history), self.history[2:])
+
+    @override_settings(LLM_MAX_PROMPT_TOKENS=100_000)
+    def test_short_history_sent_whole(self):
+        """Test nothing is trimmed while the history fits."""
+        self.assertEqual(_prompt_messages(self.history), self.history)
+
+
+class AssistantHumanTurnTest(SimpleTestCase):
+    """Test assistant-mode routing on the @llm prefix."""
+
+    def test_routes_on_llm_prefix(self):
+        """Test only messages starting with @llm (after whitespace) reach RAG."""
+        human_turn = create_assistant_human_turn()
+        expected_routes = [
+            ("@llm what are my options?", "retrieve_and_augment"),
+            ("  \n\t@llm hello", "retrieve_and_augment"),
+            ("hello @llm", "END"),
+            ("@LLM hello", "END"),
+            ("", "END"),
+        ]
+
+        for content, next_state in expected_routes:
+            with self.subTest(content=content):
+                state = {"messages": [HumanMessage(content=content)]}
+                # Routing writes only the route and the per-turn citation reset
+                self.assertEqual(
+                    human_turn(state),
+                    {"next_state": next_state, "turn_citations": []},
                 )
 
-            # The model should have been invoked with messages
-            self.assertTrue(mock_model.invoke.called)
 
-            # Get the messages that were passed to the model
-            call_args = mock_model.invoke.call_args
-            messages = call_args[0][0]  # First positional argument
+def _build_noop_graph(checkpointer, store=None):
+    builder = StateGraph(SdmState)
+    builder.add_node("noop", lambda state: {})
+    builder.add_edge(START, "noop")
+    builder.add_edge("noop", END)
+    return builder.compile(checkpointer=checkpointer, store=store)
 
-            # Find the system message (should be first)
-            system_message = None
-            for msg in messages:
-                if msg.type == "system":
-                    system_message = msg
-                    break
-            # Verify system message contains user context
-            self.assertIsNotNone(system_message)
-            if system_message:
-                self.assertIn("USER CONTEXT:", system_message.content)
-                self.assertIn("Bob", system_message.content)
-                self.assertIn("June 20", system_message.content)
-
-    @patch("sdm_platform.llmchat.utils.graphs.base.init_chat_model")
-    @patch("sdm_platform.llmchat.utils.graphs.nodes.retrieval.get_chroma_client")
-    def test_graph_works_without_profile(self, mock_chroma, mock_init_model):
-        """Test that the graph works normally when no profile exists."""
-        # Mock the LLM to return a proper AIMessage
-        mock_model = MagicMock()
-        mock_model.invoke.return_value = AIMessage(content="Hello!")
-        mock_init_model.return_value = mock_model
-
-        # Mock Chroma to return empty collections (no RAG)
-        mock_client = MagicMock()
-        mock_client.list_collections.return_value = []
-        mock_chroma.return_value = mock_client
-
-        # Build the graph
-        with get_postgres_checkpointer() as checkpointer, get_memory_store() as store:
-            graph = get_compiled_graph(checkpointer, store=store)
-
-            config = RunnableConfig(
-                configurable={
-                    "thread_id": "test_thread_no_memory",
-                    "user_id": "nonexistent@example.com",
-                },
-            )
 
-            # Should not raise an exception
-            # Use @llm prefix to trigger model invocation
-            result = graph.invoke(
-                {
-                    "messages": [
-                        HumanMessage(content="@llm Hello"),
-                    ],
-                    "user_context": "",
-                    "system_prompt": "",
-                    "turn_citations": [],
-                },
-                config,
-            )
+class GetCompiledGraphTest(SimpleTestCase):
+    """Test compiled graphs are cached per mode and bound per call."""
+
+    def setUp(self):
+        _COMPILED_GRAPHS.clear()
+        self.addCleanup(_COMPILED_GRAPHS.clear)
+        original = GraphRegistry.get_builder(GraphMode.ASSISTANT)
+        self.addCleanup(GraphRegistry.register, GraphMode.ASSISTANT, original)
+        self.builder = MagicMock(side_effect=_build_noop_graph)
+        GraphRegistry.register(GraphMode.ASSISTANT, self.builder)
+
+    def test_builds_once_and_binds_each_caller(self):
+        """Test later calls reuse the build but get their own saver and store."""
+        savers = [InMemorySaver(), InMemorySaver()]
+        stores = [InMemoryStore(), None]
+
+        graphs = [
+            get_compiled_graph(saver, store=store, mode=GraphMode.ASSISTANT)
+            for saver, store in zip(savers, stores, strict=True)
+        ]
+
+        self.builder.assert_called_once_with(None, None)
+        for graph, saver, store in zip(graphs, savers, stores, strict=True):
+            self.assertIs(graph.checkpointer, saver)
+            self.assertIs(graph.store, store)
+
+    def test_register_drops_cached_graph(self):
+        """Test registering a builder again rebuilds that mode's graph."""
+        get_compiled_graph(InMemorySaver(), mode=GraphMode.ASSISTANT)
+        GraphRegistry.register(GraphMode.ASSISTANT, self.builder)
+        get_compiled_graph(InMemorySaver(), mode=GraphMode.ASSISTANT)
+
+        self.assertEqual(self.builder.call_count, 2)
+
+
+class GetCollectionsToSearchTest(SimpleTestCase):
+    """Test choosing and caching the Chroma collections to search."""
+
+    def setUp(self):
+        _COLLECTIONS_CACHE.clear()
+        self.addCleanup(_COLLECTIONS_CACHE.clear)
+        self.client = MagicMock()
+        self.client.list_collections.return_value = [
+            SimpleNamespace(name=name) for name in ("other", "doc_1", "doc_2")
+        ]
+
+    def test_prefers_doc_collections(self):
+        """Test ingested doc_ collections are chosen over others."""
+        self.assertEqual(
+            _get_collections_to_search(self.client, limit=1),
+            ["doc_1"],
+        )
+
+    def test_global_collection_searched_first(self):
+        """Test the shared collection leads, with any not-yet-migrated docs."""
+        self.client.list_collections.return_value.append(
+            SimpleNamespace(name=GLOBAL_COLLECTION),
+        )
+
+        self.assertEqual(
+            _get_collections_to_search(self.client, limit=50),
+            [GLOBAL_COLLECTION, "doc_1", "doc_2"],
+        )
+
+    def test_reuses_listing_until_ttl_expires(self):
+        """Test collections are listed once per TTL window."""
+        with patch.object(retrieval.time, "monotonic", return_value=100.0) as clock:
+            first = _get_collections_to_search(self.client, limit=50)
+            clock.return_value += _COLLECTIONS_CACHE_TTL - 1
+            second = _get_collections_to_search(self.client, limit=50)
+            self.assertEqual(self.client.list_collections.call_count, 1)
+
+            clock.return_value += 1
+            _get_collections_to_search(self.client, limit=50)
+            self.assertEqual(self.client.list_collections.call_count, 2)
 
-        # Should have empty user_context (no profile exists)
-        self.assertEqual(result["user_context"], "")
+        self.assertEqual(first, ["doc_1", "doc_2"])
+        self.assertEqual(second, first)
 
-        # Should still process normally and return messages
-        # Messages: original human message + AI response
-        self.assertGreaterEqual(len(result["messages"]), 1)
-        self.assertTrue(mock_model.invoke.called)
+    def test_other_client_is_not_served_from_cache(self):
+        """Test a cached listing is only reused for the client that made it."""
+        _get_collections_to_search(self.client, limit=50)
+        other = SimpleNamespace(list_collections=list)
+
+        self.assertEqual(_get_collections_to_search(other, limit=50), [])
 
 
 class DecisionAidURLConversionTest(TestCase):
@@ -1119,6 +1695,12 @@ class DecisionAidURLConversionTest(TestCase):
         result = _convert_to_embed_url(url)
         self.assertEqual(result, "https://www.youtube.com/embed/dQw4w9WgXcQ")
 
+    def test_convert_youtube_watch_url_with_other_params(self):
+        """Test that the video id is found among other watch URL params."""
+        url = "https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ#t=3"
+        result = _convert_to_embed_url(url)
+        self.assertEqual(result, "https://www.youtube.com/embed/dQw4w9WgXcQ")
+
     def test_convert_vimeo_url(self):
         """Test converting Vimeo URL to embed URL."""
         url = "https://vimeo.com/123456789"
@@ -1157,25 +1739,27 @@ class DecisionAidURLConversionTest(TestCase):
 class ShowDecisionAidToolTest(TestCase):
     """Test the show_decision_aid LangChain tool."""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         import uuid  # noqa: PLC0415
 
-        self.journey, _ = Journey.objects.get_or_create(
+        cls.journey, _ = Journey.objects.get_or_create(
             slug="backpain-tool-test",
             defaults={"title": "Back Pain Journey (Tool Test)"},
         )
 
-        # Create a test decision aid with unique slug (using short UUID)
-        self.unique_id = str(uuid.uuid4())[:8]
-        self.aid = DecisionAid.objects.create(
-            slug=f"spine-{self.unique_id}",
+        # Create a test decision aid with unique slug (using short UUID) so it
+        # can't collide with aids loaded by data migrations
+        cls.unique_id = str(uuid.uuid4())[:8]
+        cls.aid = DecisionAid.objects.create(
+            slug=f"spine-{cls.unique_id}",
             title="Spine Anatomy",
             aid_type=DecisionAid.AidType.IMAGE,
             external_url="https://example.com/spine.png",
             description="A diagram of the spine.",
             alt_text="Spine anatomy diagram",
         )
-        self.aid_slug = self.aid.slug
+        cls.aid_slug = cls.aid.slug
 
     def test_show_decision_aid_success(self):
         """Test successful retrieval of a decision aid."""
@@ -1235,6 +1819,13 @@ class ShowDecisionAidToolTest(TestCase):
         self.assertTrue(result["success"])
         self.assertEqual(result["url"], "https://www.youtube.com/embed/abc123")
 
+    # Keep the upload in memory rather than writing it under MEDIA_ROOT
+    @override_settings(
+        STORAGES={
+            **settings.STORAGES,
+            "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+        },
+    )
     def test_show_decision_aid_uses_file_url_when_present(self):
         """Test that file URL is used when file is uploaded."""
         from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: PLC0415
@@ -1282,7 +1873,7 @@ class FormatMessageWithDecisionAidsTest(TestCase):
 
     def test_format_message_with_decision_aids(self):
         """Test that decision_aids are included in formatted message."""
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
         decision_aids = [
             {
                 "aid_id": "abc123",
@@ -1306,7 +1897,7 @@ class FormatMessageWithDecisionAidsTest(TestCase):
 
     def test_format_message_without_decision_aids(self):
         """Test that decision_aids defaults to empty when not provided."""
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
 
         result = format_message(
             role="ai",
@@ -1325,7 +1916,7 @@ class ChatHistoryWithDecisionAidsTest(TestCase):
 
     def test_get_chat_history_includes_decision_aids(self):
         """Test that decision aids are preserved in chat history."""
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
 
         decision_aids = [
             {
@@ -1337,13 +1928,14 @@ class ChatHistoryWithDecisionAidsTest(TestCase):
             }
         ]
 
-        mock_snap = MagicMock()
-        mock_snap.values = {
-            "messages": [AIMessage(content="Here's the aid.")],
-            "turn_citations": [],
-            "turn_decision_aids": decision_aids,
-        }
-        mock_snap.created_at = timestamp.isoformat()
+        mock_snap = SimpleNamespace(
+            values={
+                "messages": [AIMessage(content="Here's the aid.")],
+                "turn_citations": [],
+                "turn_decision_aids": decision_aids,
+            },
+            created_at=timestamp.isoformat(),
+        )
 
         result = get_chat_history([mock_snap])
 
@@ -1352,15 +1944,16 @@ class ChatHistoryWithDecisionAidsTest(TestCase):
 
     def test_get_chat_history_empty_decision_aids(self):
         """Test chat history with no decision aids."""
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
 
-        mock_snap = MagicMock()
-        mock_snap.values = {
-            "messages": [AIMessage(content="Just text.")],
-            "turn_citations": [],
-            # No turn_decision_aids key
-        }
-        mock_snap.created_at = timestamp.isoformat()
+        mock_snap = SimpleNamespace(
+            values={
+                "messages": [AIMessage(content="Just text.")],
+                "turn_citations": [],
+                # No turn_decision_aids key
+            },
+            created_at=timestamp.isoformat(),
+        )
 
         result = get_chat_history([mock_snap])
 
@@ -1368,42 +1961,46 @@ class ChatHistoryWithDecisionAidsTest(TestCase):
         self.assertEqual(result[0]["turn_decision_aids"], [])
 
 
+@fast_password_hashers
 class HistoryViewDecisionAidsTest(TestCase):
     """Test the history view with decision aids."""
 
-    def setUp(self):
-        self.client = Client()
-        self.user = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
             email="test@example.com",
             password="testpass123",
         )
-        self.client.login(username="test@example.com", password="testpass123")
-
-        self.conversation = Conversation.objects.create(
-            user=self.user,
+        cls.conversation = Conversation.objects.create(
+            user=cls.user,
             title="Test Conversation",
         )
-
-    @patch("sdm_platform.llmchat.views.get_postgres_checkpointer")
-    @patch("sdm_platform.llmchat.views.get_compiled_graph")
-    @patch("sdm_platform.llmchat.views.get_chat_history")
-    def test_history_view_includes_decision_aids(
-        self,
-        mock_get_chat_history,
-        mock_get_graph,
-        mock_get_checkpointer,
-    ):
-        """Test that history view includes decision aids in response."""
-        mock_checkpointer_instance = MagicMock()
-        mock_get_checkpointer.return_value.__enter__.return_value = (
-            mock_checkpointer_instance
+        cls.history_url = reverse(
+            "conversation_history",
+            kwargs={"conversation_id": cls.conversation.id},
         )
+        cls.session_id = _session_cookie_for(cls.user)
 
-        mock_graph = MagicMock()
-        mock_get_graph.return_value = mock_graph
-        mock_graph.get_state_history.return_value = []
+    def setUp(self):
+        # The session row lives as long as the class fixtures; just present it
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = self.session_id
+
+        # The view's checkpointer, graph and history helpers, patched in one go;
+        # each test only supplies the processed history
+        patcher = patch.multiple(
+            llmchat_views,
+            get_postgres_checkpointer=DEFAULT,
+            get_compiled_graph=DEFAULT,
+            get_chat_history=DEFAULT,
+        )
+        mocks = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_get_chat_history = mocks["get_chat_history"]
+        mocks["get_compiled_graph"].return_value.get_state_history.return_value = []
 
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+    def test_history_view_includes_decision_aids(self):
+        """Test that history view includes decision aids in response."""
+        timestamp = _NOW
         decision_aids = [
             {
                 "aid_id": "test-id",
@@ -1414,7 +2011,7 @@ class HistoryViewDecisionAidsTest(TestCase):
             }
         ]
 
-        mock_get_chat_history.return_value = [
+        self.mock_get_chat_history.return_value = [
             {
                 "created_at": timestamp,
                 "new_messages": [
@@ -1432,40 +2029,20 @@ class HistoryViewDecisionAidsTest(TestCase):
         ]
 
         response = self.client.get(
-            reverse(
-                "conversation_history",
-                kwargs={"conversation_id": self.conversation.id},
-            ),
+            self.history_url,
         )
 
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.content)
+        data = response.json()
         self.assertEqual(len(data["messages"]), 1)
         self.assertEqual(data["messages"][0]["decision_aids"], decision_aids)
 
-    @patch("sdm_platform.llmchat.views.get_postgres_checkpointer")
-    @patch("sdm_platform.llmchat.views.get_compiled_graph")
-    @patch("sdm_platform.llmchat.views.get_chat_history")
-    def test_history_view_skips_empty_ai_messages(
-        self,
-        mock_get_chat_history,
-        mock_get_graph,
-        mock_get_checkpointer,
-    ):
+    def test_history_view_skips_empty_ai_messages(self):
         """Test that AI messages with empty content (tool calls) are skipped."""
-        mock_checkpointer_instance = MagicMock()
-        mock_get_checkpointer.return_value.__enter__.return_value = (
-            mock_checkpointer_instance
-        )
-
-        mock_graph = MagicMock()
-        mock_get_graph.return_value = mock_graph
-        mock_graph.get_state_history.return_value = []
-
-        timestamp = datetime.datetime.now(ZoneInfo(settings.TIME_ZONE))
+        timestamp = _NOW
 
         # Simulate a tool call message (empty content) followed by actual response
-        mock_get_chat_history.return_value = [
+        self.mock_get_chat_history.return_value = [
             {
                 "created_at": timestamp,
                 "new_messages": [
@@ -1490,14 +2067,11 @@ class HistoryViewDecisionAidsTest(TestCase):
         ]
 
         response = self.client.get(
-            reverse(
-                "conversation_history",
-                kwargs={"conversation_id": self.conversation.id},
-            ),
+            self.history_url,
         )
 
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.content)
+        data = response.json()
         # Should only have the non-empty AI message
         self.assertEqual(len(data["messages"]), 1)
         self.assertEqual(data["messages"][0]["content"], "Here's the actual response.")
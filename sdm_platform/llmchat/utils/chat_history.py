@@ -8,35 +8,25 @@ def get_chat_history(history):
     Turn a list of StateSnapshots into per-step diffs.
     Each entry only contains the messages that were added at that step.
     """
-    # Put into chronological order (oldest → newest)
-    snaps = list(reversed(history))
-
-    prev_msgs = []
+    # A snap contains config, metadata, values, next, tasks and created_at;
+    # values (the graph state) and created_at are the useful ones here.
+    # Walk in chronological order (oldest → newest) without copying the list,
+    # tracking how many messages the previous kept snapshot had.
+    prev_len = 0
     diffs = []
-    i = 1
-    for snap in snaps:  # skip that first message (??)
-        """
-        for posterity, a snap contains:
-          snap.config
-          snap.metadata
-          snap.values
-          snap.next
-          snap.tasks
-          snap.created_at <-- this is the useful one
-        """
-        cur_msgs = snap.values.get("messages", [])
+    for snap in reversed(history):
+        values = snap.values
+        cur_msgs = values.get("messages", [])
         # new messages = everything after the previous snapshot's messages
-        new_msgs = cur_msgs[len(prev_msgs) :]
-        if not new_msgs:
+        if len(cur_msgs) <= prev_len:
             continue
         diffs.append(
             {
                 "created_at": datetime.fromisoformat(snap.created_at),
-                "new_messages": [message_to_dict(m) for m in new_msgs],
-                "turn_citations": snap.values.get("turn_citations", []),
-                "turn_decision_aids": snap.values.get("turn_decision_aids", []),
+                "new_messages": [message_to_dict(m) for m in cur_msgs[prev_len:]],
+                "turn_citations": values.get("turn_citations", []),
+                "turn_decision_aids": values.get("turn_decision_aids", []),
             },
         )
-        prev_msgs = cur_msgs
-        i = i + 1
+        prev_len = len(cur_msgs)
     return diffs
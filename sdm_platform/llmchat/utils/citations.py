@@ -0,0 +1,97 @@
+"""Citation helpers - compact citations in graph state, hydrated for display"""
+
+import uuid
+
+from django.db.models import F
+from django.db.models import Q
+from django.urls import reverse
+
+# Longest chunk text quoted in the system prompt or shown with a citation
+EXCERPT_MAX_LENGTH = 800
+
+
+def truncate_excerpt(text: str) -> str:
+    """Cut text down to EXCERPT_MAX_LENGTH characters, marking the cut."""
+    if len(text) > EXCERPT_MAX_LENGTH:
+        return text[:EXCERPT_MAX_LENGTH] + "..."
+    return text
+
+
+def _document_uuid(doc_id) -> uuid.UUID | None:
+    """Return doc_id as a UUID, or None if it isn't an ingested document's id."""
+    try:
+        return uuid.UUID(str(doc_id))
+    except ValueError:
+        return None
+
+
+def hydrate_citations(citations: list[dict]) -> list[dict]:
+    """
+    Add the display fields (url, title, excerpt) to citations kept in graph state.
+
+    Graph state only stores a pointer per citation (doc_id, version,
+    chunk_index, score, ...) since it is checkpointed on every node. The
+    excerpts and document names are read back from the DocumentChunk cache in
+    a single query, from the version that was cited, so re-ingesting a document
+    doesn't change what older answers quote. Citations stored before versions
+    were recorded read the document's current version. The url is the chunk's
+    source_url when it had one, else the document download link. Citations
+    that already carry a url (stored before state was compacted) are returned
+    unchanged.
+
+    Args:
+        citations: Citation dicts from turn_citations
+
+    Returns:
+        New list of citation dicts ready for the frontend
+    """
+    from sdm_platform.evidence.models import DocumentChunk  # noqa: PLC0415
+
+    keys = {
+        (doc_uuid, citation.get("version"), citation.get("chunk_index"))
+        for citation in citations
+        if "url" not in citation
+        and (doc_uuid := _document_uuid(citation.get("doc_id")))
+    }
+    chunks = {}
+    if keys:
+        chunk_filter = Q()
+        for doc_uuid, version, chunk_index in keys:
+            chunk_filter |= Q(
+                document_id=doc_uuid,
+                version=F("document__version") if version is None else version,
+                chunk_index=chunk_index,
+            )
+        rows = DocumentChunk.objects.filter(chunk_filter).values_list(
+            "document_id",
+            "version",
+            "chunk_index",
+            "document__version",
+            "document__name",
+            "text",
+        )
+        for document_id, version, chunk_index, current, name, text in rows:
+            chunks[(document_id, version, chunk_index)] = (name, text)
+            if version == current:
+                chunks[(document_id, None, chunk_index)] = (name, text)
+
+    hydrated = []
+    for citation in citations:
+        if "url" in citation:
+            hydrated.append(citation)
+            continue
+        doc_uuid = _document_uuid(citation.get("doc_id"))
+        key = (doc_uuid, citation.get("version"), citation.get("chunk_index"))
+        name, text = chunks.get(key, (None, ""))
+        url = citation.get("source_url")
+        if not url and doc_uuid:
+            url = reverse("evidence:document_download", args=[doc_uuid])
+        hydrated.append(
+            {
+                **citation,
+                "url": url,
+                "title": name,
+                "excerpt": truncate_excerpt(text),
+            },
+        )
+    return hydrated
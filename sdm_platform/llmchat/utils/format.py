@@ -1,5 +1,14 @@
 import datetime
 
+# Message roles (LangChain and frontend spellings) mapped to the frontend's roles
+_ROLE_MAP = {
+    "assistant": "bot",
+    "ai": "bot",
+    "bot": "bot",
+    "human": "user",
+    "user": "user",
+}
+
 
 def format_message(  # noqa: PLR0913
     role: str,
@@ -25,12 +34,7 @@ def format_message(  # noqa: PLR0913
     """
     # -- the javascript is looking for one of
     # user (the user) bot (llm) or peer (a different user)
-    if role in ["assistant", "ai", "bot"]:
-        role = "bot"
-    elif role in ["human", "user"]:
-        role = "user"
-    else:
-        role = "unknown"
+    role = _ROLE_MAP.get(role, "unknown")
 
     result = {
         "role": role,
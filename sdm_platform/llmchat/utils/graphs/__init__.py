@@ -15,7 +15,9 @@ from langgraph.graph.state import CompiledStateGraph
 from langgraph.store.base import BaseStore
 
 from sdm_platform.llmchat.utils.graphs.base import SdmState
+from sdm_platform.llmchat.utils.graphs.base import close_postgres_checkpointer
 from sdm_platform.llmchat.utils.graphs.base import get_postgres_checkpointer
+from sdm_platform.llmchat.utils.graphs.base import warm_postgres_checkpointer
 from sdm_platform.llmchat.utils.graphs.builders.assistant import build_assistant_graph
 from sdm_platform.llmchat.utils.graphs.builders.autonomous import build_autonomous_graph
 
@@ -33,7 +35,12 @@ class GraphMode(str, Enum):
 
 
 # Type alias for graph builder functions
-GraphBuilder = Callable[[PostgresSaver, BaseStore | None], CompiledStateGraph]
+GraphBuilder = Callable[[PostgresSaver | None, BaseStore | None], CompiledStateGraph]
+
+# Graphs compiled without a checkpointer or store, one per mode. Building one
+# initializes the model, binds its tools and validates the graph, so it is done
+# once per process; each call then copies it with its own checkpointer and store.
+_COMPILED_GRAPHS: dict[GraphMode, CompiledStateGraph] = {}
 
 
 class GraphRegistry:
@@ -59,6 +66,7 @@ class GraphRegistry:
         Allows extending the registry without modifying this file.
         """
         cls._builders[mode] = builder
+        _COMPILED_GRAPHS.pop(mode, None)
         logger.info("Registered graph builder for mode: %s", mode.value)
 
     @classmethod
@@ -74,7 +82,7 @@ class GraphRegistry:
     def build_graph(
         cls,
         mode: GraphMode,
-        checkpointer: PostgresSaver,
+        checkpointer: PostgresSaver | None,
         store: BaseStore | None = None,
     ) -> CompiledStateGraph:
         """
@@ -116,7 +124,9 @@ def get_compiled_graph(
     """
     Get a compiled graph for the specified or configured mode.
 
-    This is the main entry point for graph retrieval.
+    This is the main entry point for graph retrieval. The graph for each mode
+    is built once and cached; callers get a copy bound to their checkpointer
+    and store, so the per-request context managers can keep opening their own.
 
     Args:
         checkpointer: PostgresSaver for state persistence
@@ -129,8 +139,12 @@ def get_compiled_graph(
     if mode is None:
         mode = get_graph_mode_from_settings()
 
-    logger.debug("Building graph for mode: %s", mode.value)
-    return GraphRegistry.build_graph(mode, checkpointer, store)
+    graph = _COMPILED_GRAPHS.get(mode)
+    if graph is None:
+        logger.debug("Building graph for mode: %s", mode.value)
+        graph = GraphRegistry.build_graph(mode, None)
+        _COMPILED_GRAPHS[mode] = graph
+    return graph.copy(update={"checkpointer": checkpointer, "store": store})
 
 
 # Public API exports
@@ -138,7 +152,9 @@ __all__ = [
     "GraphMode",
     "GraphRegistry",
     "SdmState",
+    "close_postgres_checkpointer",
     "get_compiled_graph",
     "get_graph_mode_from_settings",
     "get_postgres_checkpointer",
+    "warm_postgres_checkpointer",
 ]
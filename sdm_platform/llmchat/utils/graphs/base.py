@@ -1,16 +1,26 @@
 """Base state schema and shared utilities for all graph modes."""
 
+import functools
 import logging
+from contextlib import ExitStack
+from contextlib import nullcontext
 
 import environ
 from django.conf import settings
 from langchain.chat_models import init_chat_model
 from langchain.embeddings import init_embeddings
+from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.postgres import PostgresSaver
 from langgraph.graph import MessagesState
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
 
 logger = logging.getLogger(__name__)
 
+# Process-wide checkpointer opened by warm_postgres_checkpointer() (Celery workers)
+_warm_checkpointer: PostgresSaver | None = None
+_warm_stack = ExitStack()
+
 
 class SdmState(MessagesState):
     """
@@ -29,14 +39,29 @@ class SdmState(MessagesState):
     turn_decision_aids: list[dict]
 
 
+@functools.cache
+def _init_chat_model(model_name: str):
+    return init_chat_model(model_name)
+
+
+@functools.cache
+def _init_embeddings(model_name: str):
+    return init_embeddings(model_name)
+
+
 def get_model():
-    """Get the shared LLM model instance."""
-    return init_chat_model(settings.LLM_CHAT_MODEL)
+    """
+    Get the shared LLM model instance.
+
+    One instance per configured model is kept for the process, so compiling a
+    graph doesn't rebuild its HTTP client.
+    """
+    return _init_chat_model(settings.LLM_CHAT_MODEL)
 
 
 def get_embeddings():
-    """Get the shared embeddings instance for RAG."""
-    return init_embeddings(settings.LLM_EMBEDDING_MODEL)
+    """Get the shared embeddings instance for RAG (one per configured model)."""
+    return _init_embeddings(settings.LLM_EMBEDDING_MODEL)
 
 
 def get_thing(obj, attr, default=None):
@@ -45,38 +70,82 @@ def get_thing(obj, attr, default=None):
 
 
 def get_postgres_checkpointer():
-    """Get a PostgresSaver checkpointer for graph state persistence."""
+    """
+    Get a PostgresSaver checkpointer for graph state persistence.
+
+    Returns a context manager. If this process has a warmed checkpointer (see
+    warm_postgres_checkpointer) it is reused; otherwise a new connection is
+    opened for the duration of the ``with`` block.
+    """
+    if _warm_checkpointer is not None:
+        return nullcontext(_warm_checkpointer)
     env = environ.Env()
     return PostgresSaver.from_conn_string(env.str("DATABASE_URL"))  # pyright: ignore[reportArgumentType]
 
 
+def warm_postgres_checkpointer() -> PostgresSaver:
+    """
+    Open a long-lived checkpointer for this process and prime its connection.
+
+    Called when a Celery worker process starts so the first task doesn't pay
+    for the connection handshake, schema check and statement preparation.
+    The connection lives in a single-slot pool that is health-checked on
+    checkout, so a dropped connection is replaced instead of failing tasks.
+    """
+    global _warm_checkpointer  # noqa: PLW0603
+    if _warm_checkpointer is not None:
+        return _warm_checkpointer
+
+    env = environ.Env()
+    with ExitStack() as stack:
+        pool = stack.enter_context(
+            ConnectionPool(
+                env.str("DATABASE_URL"),  # pyright: ignore[reportArgumentType]
+                min_size=1,
+                kwargs={
+                    "autocommit": True,
+                    "prepare_threshold": 0,
+                    "row_factory": dict_row,
+                },
+                check=ConnectionPool.check_connection,
+            )
+        )
+        checkpointer = PostgresSaver(pool)  # pyright: ignore[reportArgumentType]
+        checkpointer.setup()  # idempotent; migration 0002 normally did this
+        checkpointer.get(RunnableConfig(configurable={"thread_id": "__warmup__"}))
+        # Only keep the pool open once warm-up has succeeded
+        _warm_stack.enter_context(stack.pop_all())
+
+    _warm_checkpointer = checkpointer
+    logger.info("Warmed Postgres checkpointer for this process")
+    return checkpointer
+
+
+def close_postgres_checkpointer() -> None:
+    """Close the process-wide checkpointer opened by warm_postgres_checkpointer."""
+    global _warm_checkpointer  # noqa: PLW0603
+    _warm_checkpointer = None
+    _warm_stack.close()
+
+
 GLOBAL_INSTRUCTIONS = (
     "Do not share external video links (e.g., YouTube) as sources may be "
     "unreliable or broken. Focus on text-based explanations and retrieved evidence."
 )
 
 
-def _build_system_message_and_continue(  # noqa: PLR0913
-    msgs: list,
-    user_context: str,
+@functools.lru_cache(maxsize=256)
+def _render_system_content(
     system_prompt: str,
-    turn_citations: list,
-    evidence_lines: list[str] | None = None,
-    aids_context: str | None = None,
-) -> dict:
+    user_context: str,
+    evidence_lines: tuple[str, ...],
+    aids_context: str | None,
+) -> str:
     """
-    Helper to build system message from context and optional evidence.
+    Join the system message content for one turn.
 
-    Args:
-        msgs: Current message history
-        user_context: User profile context (name, etc.)
-        system_prompt: Conversation system prompt (journey responses, etc.)
-        turn_citations: List of citation dicts
-        evidence_lines: Optional list of evidence strings
-        aids_context: Optional string listing available decision aids
-
-    Returns:
-        State dict with augmented messages
+    The profile, journey prompt and aids list rarely change between turns, so
+    identical inputs reuse the previously rendered string.
     """
     system_content_parts = [GLOBAL_INSTRUCTIONS]
 
@@ -103,18 +172,43 @@ def _build_system_message_and_continue(  # noqa: PLR0913
     if aids_context:
         system_content_parts.append(aids_context)
 
-    # Build and prepend system message if we have any context
-    if system_content_parts:
-        system_msg = {"role": "system", "content": "\n\n".join(system_content_parts)}
-        augmented_messages = [system_msg, *msgs]
-    else:
-        augmented_messages = msgs
+    return "\n\n".join(system_content_parts)
+
+
+def _build_system_message_and_continue(
+    user_context: str,
+    system_prompt: str,
+    turn_citations: list,
+    evidence_lines: list[str] | None = None,
+    aids_context: str | None = None,
+) -> dict:
+    """
+    Helper to build system message from context and optional evidence.
+
+    Only the keys this step changes are returned: add_messages appends the
+    system message to the history, and the context values are left alone.
+
+    Args:
+        user_context: User profile context (name, etc.)
+        system_prompt: Conversation system prompt (journey responses, etc.)
+        turn_citations: List of citation dicts
+        evidence_lines: Optional list of evidence strings
+        aids_context: Optional string listing available decision aids
+
+    Returns:
+        State update with the system message
+    """
+    system_content = _render_system_content(
+        system_prompt,
+        user_context,
+        tuple(evidence_lines or ()),
+        aids_context,
+    )
+    system_msg = {"role": "system", "content": system_content}
 
     return {
-        "messages": augmented_messages,
+        "messages": [system_msg],
         "next_state": "call_model",
         "turn_citations": turn_citations,
         "turn_decision_aids": [],
-        "user_context": user_context,
-        "system_prompt": system_prompt,
     }
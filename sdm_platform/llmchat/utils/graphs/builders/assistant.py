@@ -16,7 +16,7 @@ from sdm_platform.llmchat.utils.graphs.nodes import create_retrieve_and_augment_
 
 
 def build_assistant_graph(
-    checkpointer: PostgresSaver,
+    checkpointer: PostgresSaver | None,
     store: BaseStore | None = None,
 ):
     """
@@ -42,7 +42,7 @@ def build_assistant_graph(
                                         END ────────────┘
     """
     # Create node functions with dependencies injected
-    load_context = create_load_context_node(store)
+    load_context = create_load_context_node()
     human_turn = create_assistant_human_turn()
     retrieve_and_augment = create_retrieve_and_augment_node()
     call_model = create_call_model_node()
@@ -89,4 +89,4 @@ def build_assistant_graph(
 
     builder.add_edge("extract_memories", END)
 
-    return builder.compile(checkpointer=checkpointer)
+    return builder.compile(checkpointer=checkpointer, store=store)
@@ -16,7 +16,7 @@ from sdm_platform.llmchat.utils.graphs.nodes import create_retrieve_and_augment_
 
 
 def build_autonomous_graph(
-    checkpointer: PostgresSaver,
+    checkpointer: PostgresSaver | None,
     store: BaseStore | None = None,
 ):
     """
@@ -40,7 +40,7 @@ def build_autonomous_graph(
                                         END ────────────┘
     """
     # Create node functions with dependencies injected
-    load_context = create_load_context_node(store)
+    load_context = create_load_context_node()
     human_turn = create_autonomous_human_turn()
     retrieve_and_augment = create_retrieve_and_augment_node()
     call_model = create_call_model_node()
@@ -87,4 +87,4 @@ def build_autonomous_graph(
 
     builder.add_edge("extract_memories", END)
 
-    return builder.compile(checkpointer=checkpointer)
+    return builder.compile(checkpointer=checkpointer, store=store)
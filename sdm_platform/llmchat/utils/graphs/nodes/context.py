@@ -11,18 +11,22 @@ from sdm_platform.memory.managers import UserProfileManager
 logger = logging.getLogger(__name__)
 
 
-def create_load_context_node(store: BaseStore | None = None):
+def create_load_context_node():
     """
-    Factory function to create load_context node with store binding.
+    Factory function to create load_context node.
 
-    Args:
-        store: PostgresStore for memory lookup
+    The memory store is not bound here: LangGraph passes the store the graph
+    was compiled or copied with, so one compiled graph serves every store.
 
     Returns:
         Node function that loads user context and system prompt
     """
 
-    def load_context(state: SdmState, config: RunnableConfig):
+    def load_context(
+        state: SdmState,
+        config: RunnableConfig,
+        store: BaseStore | None = None,
+    ):
         """
         Load all context needed for the conversation:
         - User profile from memory store (name, preferences, etc.)
@@ -31,7 +35,6 @@ def create_load_context_node(store: BaseStore | None = None):
         This runs at the start of each turn to provide full context.
         """
         user_context = ""
-        system_prompt = ""
 
         # Load user profile from memory store
         if store:
@@ -43,13 +46,8 @@ def create_load_context_node(store: BaseStore | None = None):
                 except Exception:
                     logger.exception("Error loading user context for %s", user_id)
 
-        # Load conversation system prompt (from state if provided)
-        # This comes from the initial invoke call in tasks.py
-        system_prompt = state.get("system_prompt", "")
-
-        return {
-            "user_context": user_context,
-            "system_prompt": system_prompt,
-        }
+        # The conversation system prompt is already in state (it comes from the
+        # initial invoke call in tasks.py), so only the profile is written
+        return {"user_context": user_context}
 
     return load_context
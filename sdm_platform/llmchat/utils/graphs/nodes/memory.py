@@ -26,7 +26,7 @@ def create_extract_memories_node():
         Gets user_id and journey_slug from config, formats recent messages,
         and fires the appropriate extraction task.
 
-        Returns state unchanged (non-blocking).
+        Writes nothing to the state (non-blocking).
         """
         configurable = config.get("configurable", {})
         user_id = configurable.get("user_id")
@@ -34,7 +34,7 @@ def create_extract_memories_node():
 
         if not user_id:
             logger.warning("extract_memories: no user_id in config, skipping")
-            return state
+            return {}
 
         # Format recent messages for extraction (last 50)
         recent_messages = [
@@ -45,7 +45,7 @@ def create_extract_memories_node():
 
         if not recent_messages:
             logger.debug("extract_memories: no messages to extract from")
-            return state
+            return {}
 
         # Get thread_id for WebSocket status updates
         thread_id = configurable.get("thread_id")
@@ -64,7 +64,7 @@ def create_extract_memories_node():
             logger.info("Spawning extract_user_profile_memory for user=%s", user_id)
             extract_user_profile_memory.delay(user_id, recent_messages)  # pyright: ignore[reportCallIssue]
 
-        # Return state unchanged
-        return state
+        # Nothing to write; returning no keys leaves every channel as it is
+        return {}
 
     return extract_memories
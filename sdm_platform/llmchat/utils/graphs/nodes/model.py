@@ -1,5 +1,9 @@
 """Model calling node - invokes the LLM with augmented messages."""
 
+from django.conf import settings
+from langchain_core.messages import trim_messages
+from langchain_core.messages.utils import count_tokens_approximately
+
 from sdm_platform.llmchat.utils.graphs.base import SdmState
 from sdm_platform.llmchat.utils.graphs.base import get_model
 from sdm_platform.llmchat.utils.tools import show_decision_aid
@@ -8,6 +12,30 @@ from sdm_platform.llmchat.utils.tools import show_decision_aid
 TOOLS = [show_decision_aid]
 
 
+def _prompt_messages(messages: list) -> list:
+    """
+    Pick the most recent messages that fit in LLM_MAX_PROMPT_TOKENS.
+
+    The window always starts on a human message, so tool results are never
+    sent without the call that produced them. If even the latest turn is over
+    budget, that whole turn is sent rather than nothing.
+    """
+    trimmed = trim_messages(
+        messages,
+        max_tokens=settings.LLM_MAX_PROMPT_TOKENS,
+        strategy="last",
+        token_counter=count_tokens_approximately,
+        start_on="human",
+    )
+    if trimmed:
+        return trimmed
+    last_human = next(
+        (i for i in range(len(messages) - 1, -1, -1) if messages[i].type == "human"),
+        0,
+    )
+    return messages[last_human:]
+
+
 def create_call_model_node():
     """
     Factory function to create call_model node.
@@ -26,7 +54,8 @@ def create_call_model_node():
         to call. If it does, the response will contain tool_calls and routing
         will send it to the execute_tools node.
         """
-        model_response = model_with_tools.invoke(state["messages"])
+        # The full history stays in state; only the prompt is windowed
+        model_response = model_with_tools.invoke(_prompt_messages(state["messages"]))
 
         # Extract the assistant's final message text from the model response
         # Support multiple shapes: dict {"messages": [...]}, list, or message-like obj
@@ -42,13 +71,7 @@ def create_call_model_node():
         has_tool_calls = bool(getattr(last_message, "tool_calls", None))
         next_state = "execute_tools" if has_tool_calls else "extract_memories"
 
-        return {
-            "messages": response_messages,
-            "next_state": next_state,
-            "user_context": state.get("user_context", ""),
-            "system_prompt": state.get("system_prompt", ""),
-            "turn_citations": state.get("turn_citations", []) or [],
-            "turn_decision_aids": state.get("turn_decision_aids", []) or [],
-        }
+        # Only the new messages and route; every other key is left as it is
+        return {"messages": response_messages, "next_state": next_state}
 
     return call_model
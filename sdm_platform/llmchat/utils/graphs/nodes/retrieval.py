@@ -1,23 +1,43 @@
 """RAG retrieval node - retrieves evidence from Chroma and augments messages."""
 
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from heapq import nsmallest
+from itertools import chain
+from operator import itemgetter
 
 from django.conf import settings
 from django.db.models import Q
 from langchain_chroma import Chroma
 from langchain_core.runnables import RunnableConfig
 
+from sdm_platform.evidence.utils.chroma import GLOBAL_COLLECTION
 from sdm_platform.evidence.utils.chroma import get_chroma_client
+from sdm_platform.llmchat.utils.citations import truncate_excerpt
 from sdm_platform.llmchat.utils.graphs.base import SdmState
 from sdm_platform.llmchat.utils.graphs.base import _build_system_message_and_continue
 from sdm_platform.llmchat.utils.graphs.base import get_embeddings
-from sdm_platform.llmchat.utils.graphs.base import get_thing
 
 logger = logging.getLogger(__name__)
 
 
 _AID_DESCRIPTION_MAX_LENGTH = 150
 
+# Upper bound on concurrent per-collection Chroma queries for one turn
+_MAX_SEARCH_WORKERS = 8
+
+# Collection names change only when documents are (re)ingested, so listing them
+# is cached briefly instead of costing a Chroma round-trip on every turn.
+# Maps limit -> (client, fetched_at, collection names).
+_COLLECTIONS_CACHE_TTL = 60  # seconds
+_COLLECTIONS_CACHE: dict[int | None, tuple[object, float, list[str]]] = {}
+
+# Building a Chroma wrapper fetches its collection from the server, so wrappers
+# are kept per collection name along with the client they were built on. A
+# wrapper whose search fails is dropped, so it is rebuilt on the next turn.
+_VECTOR_STORES: dict[str, tuple[object, Chroma]] = {}
+
 
 def _get_available_aids_context(journey_slug: str | None) -> str:
     """
@@ -69,17 +89,31 @@ def _get_collections_to_search(client, limit: int | None = None) -> list[str]:
     """
     Decide which Chroma collections to search.
 
-    By default we search collections that look like doc_<uuid>_v<ver> and optionally a
-    global collection. You may override this logic (e.g., search a single global
-    collection for better performance).
+    Ingestion writes every document into GLOBAL_COLLECTION, so normally that is
+    the only collection searched. Documents ingested before it existed still live
+    in their own doc_<uuid>_v<ver> collections until they are re-ingested, so
+    those are searched alongside it.
+
+    Results are reused for _COLLECTIONS_CACHE_TTL seconds per client and limit,
+    so newly ingested documents become searchable within that window.
     """
+    now = time.monotonic()
+    cached = _COLLECTIONS_CACHE.get(limit)
+    if cached:
+        cached_client, fetched_at, cols = cached
+        if cached_client is client and now - fetched_at < _COLLECTIONS_CACHE_TTL:
+            return cols
+
     collections = [c.name for c in client.list_collections()]
-    # heuristic: prefer collections that start with "doc_" (produced by ingestion)
+    # heuristic: prefer collections produced by ingestion over anything else
     doc_cols = [c for c in collections if c.startswith("doc_")]
+    if GLOBAL_COLLECTION in collections:
+        doc_cols.insert(0, GLOBAL_COLLECTION)
     cols = doc_cols or collections
 
     if limit:
-        return cols[:limit]
+        cols = cols[:limit]
+    _COLLECTIONS_CACHE[limit] = (client, now, cols)
     return cols
 
 
@@ -104,10 +138,58 @@ def _build_journey_filter(journey_slug: str | None) -> dict | None:
     }
 
 
+def _get_vector_store(client, col: str) -> Chroma:
+    """Return the cached Chroma wrapper for col, rebuilding it for a new client."""
+    cached = _VECTOR_STORES.get(col)
+    if cached and cached[0] is client:
+        return cached[1]
+    vs = Chroma(client=client, collection_name=col)
+    _VECTOR_STORES[col] = (client, vs)
+    return vs
+
+
+def _search_collection(
+    client,
+    query_vector: list[float],
+    col: str,
+    where_filter: dict | None,
+    per_collection_k: int,
+) -> list[tuple[object, float, str]]:
+    """
+    Query one collection, keeping only results within RAG_MAX_DISTANCE.
+
+    Errors are logged and yield no results, so one bad collection doesn't sink
+    the whole search.
+    """
+    try:
+        vs = _get_vector_store(client, col)
+        # Returns (Document, score) pairs where the score is Chroma's raw
+        # distance, as with similarity_search_with_score.
+        # Lower scores = better matches (cosine distance range: 0.0-2.0)
+        search_kwargs = {"k": per_collection_k}
+        if where_filter:
+            search_kwargs["filter"] = where_filter  # pyright: ignore[reportArgumentType]
+
+        docs_and_scores = vs.similarity_search_by_vector_with_relevance_scores(
+            query_vector,
+            **search_kwargs,  # pyright: ignore[reportArgumentType]
+        )
+    except Exception:
+        logger.exception("Error searching collection %s", col)
+        # The collection may have been deleted and recreated; rebuild the
+        # wrapper next turn rather than keep searching a dead collection
+        _VECTOR_STORES.pop(col, None)
+        return []
+    return [
+        (doc, float(score), col)
+        for doc, score in docs_and_scores
+        if score < settings.RAG_MAX_DISTANCE
+    ]
+
+
 def _retrieve_top_k_from_collections(  # noqa: PLR0913
     client,
-    query: str,
-    embeddings,
+    query_vector: list[float],
     collections: list[str],
     journey_slug: str | None = None,
     per_collection_k: int = 3,
@@ -116,40 +198,76 @@ def _retrieve_top_k_from_collections(  # noqa: PLR0913
     """
     Query each collection for up to per_collection_k results.
 
+    query_vector is the already-embedded user query, shared by every
+    collection so the query is embedded once per turn rather than once per
+    collection.
+
     Returns list of tuples (Document, score, collection_name).
     We then merge and return the top max_total_k results across all collections
     sorted by score (ascending - lower is better for cosine distance).
 
+    Each query is a network round-trip, so collections are searched
+    concurrently (up to _MAX_SEARCH_WORKERS at a time).
+
     If journey_slug is provided, filters to only return documents that are
     either universal or belong to the specified journey.
+
+    GLOBAL_COLLECTION (or a lone collection) already ranks across all of its
+    documents, so it is asked for max_total_k results directly, even while
+    legacy per-document collections are searched alongside it.
     """
-    candidates = []
     where_filter = _build_journey_filter(journey_slug)
 
-    for col in collections:
-        try:
-            vs = Chroma(
-                client=client,
-                collection_name=col,
-                embedding_function=embeddings,
-            )
-            # similarity_search_with_score returns (Document, score) pairs
-            # Lower scores = better matches (cosine distance range: 0.0-2.0)
-            search_kwargs = {"k": per_collection_k}
-            if where_filter:
-                search_kwargs["filter"] = where_filter  # pyright: ignore[reportArgumentType]
+    def search(col):
+        k = (
+            max_total_k
+            if col == GLOBAL_COLLECTION or len(collections) == 1
+            else per_collection_k
+        )
+        return _search_collection(client, query_vector, col, where_filter, k)
 
-            docs_and_scores = vs.similarity_search_with_score(query, **search_kwargs)  # pyright: ignore[reportArgumentType]
-            for doc, score in docs_and_scores:
-                if score < settings.RAG_MAX_DISTANCE:
-                    candidates.append((doc, float(score), col))
-        except Exception:
-            logger.exception("Error searching collection %s", col)
-            continue
+    if len(collections) <= 1:
+        results = map(search, collections)
+    else:
+        workers = min(_MAX_SEARCH_WORKERS, len(collections))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map() keeps collection order, so score ties still break the same way
+            results = list(executor.map(search, collections))
+    candidates = chain.from_iterable(results)
+
+    # "search_with_score" --> lower is better (cosine distance). nsmallest keeps
+    # only max_total_k candidates and, like sorted(), breaks ties by order.
+    return nsmallest(max_total_k, candidates, key=itemgetter(1))
+
+
+def _search_evidence(
+    embeddings,
+    query: str,
+    journey_slug: str | None,
+) -> list[tuple[object, float, str]]:
+    """
+    Embed query and return the top evidence candidates from Chroma.
 
-    # "search_with_score" --> lower is better (cosine distance)
-    candidates_sorted = sorted(candidates, key=lambda t: t[1])
-    return candidates_sorted[:max_total_k]
+    An embedding error is logged and yields no evidence, so the turn still
+    gets an answer, just without citations.
+    """
+    client = get_chroma_client()
+    collections = _get_collections_to_search(client, limit=50)
+    if not collections:
+        return []
+    try:
+        query_vector = embeddings.embed_query(query)
+    except Exception:
+        logger.exception("Error embedding query for evidence search")
+        return []
+    return _retrieve_top_k_from_collections(
+        client=client,
+        query_vector=query_vector,
+        collections=collections,
+        journey_slug=journey_slug,
+        per_collection_k=2,
+        max_total_k=5,
+    )
 
 
 def create_retrieve_and_augment_node():
@@ -177,35 +295,32 @@ def create_retrieve_and_augment_node():
         journey_slug = configurable.get("journey_slug")
 
         # Find last user message
+        # add_messages coerces everything in state to BaseMessage, so plain
+        # attribute access is enough here
         last_user_text = None
         for m in reversed(msgs):
-            role = get_thing(m, "type")
-            content = get_thing(m, "content")
-            if role == "human" and content:
-                last_user_text = content
+            if m.type == "human" and m.content:
+                last_user_text = m.content
                 break
 
-        # Get available decision aids for the system prompt
-        aids_context = _get_available_aids_context(journey_slug)
-
         if not last_user_text:
             # No user message to process, just add context and continue
             return _build_system_message_and_continue(
-                msgs, user_context, system_prompt, [], aids_context=aids_context
+                user_context,
+                system_prompt,
+                [],
+                aids_context=_get_available_aids_context(journey_slug),
             )
 
-        # Retrieve evidence from Chroma
-        client = get_chroma_client()
-        collections = _get_collections_to_search(client, limit=50)
-        candidates = _retrieve_top_k_from_collections(
-            client=client,
-            query=last_user_text,
-            embeddings=embeddings,
-            collections=collections,
-            journey_slug=journey_slug,
-            per_collection_k=2,
-            max_total_k=5,
-        )
+        # Evidence retrieval (embedding + Chroma) and the decision-aid query
+        # don't depend on each other: search in the background while the aids
+        # are read here, on the thread that owns the Django DB connection
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            search = executor.submit(
+                _search_evidence, embeddings, last_user_text, journey_slug
+            )
+            aids_context = _get_available_aids_context(journey_slug)
+            candidates = search.result()
 
         # Build citations from candidates
         turn_citations = []
@@ -213,7 +328,10 @@ def create_retrieve_and_augment_node():
         if candidates:
             for i, (doc_obj, score, col) in enumerate(candidates, start=1):
                 md = getattr(doc_obj, "metadata", {}) or {}
-                text_excerpt = getattr(doc_obj, "page_content", "") or ""
+                # Bounds prompt tokens when documents use large chunks
+                text_excerpt = truncate_excerpt(
+                    getattr(doc_obj, "page_content", "") or ""
+                )
                 doc_id = md.get("document_id") or md.get("source")
                 chunk_idx = md.get("chunk_index")
 
@@ -223,27 +341,24 @@ def create_retrieve_and_augment_node():
                     f"{text_excerpt}"
                 )
 
-                url = md.get("source_url") or md.get("chunk_url")
-                if not url and doc_id:
-                    url = f"/documents/{doc_id}/download/"
-
+                # State is checkpointed on every node, so citations only
+                # point at the chunk; hydrate_citations adds url, title and
+                # excerpt (preferring the chunk's own source_url, if any)
                 turn_citations.append(
                     {
                         "index": i,
                         "score": score,
                         "doc_id": doc_id,
                         "collection": col,
+                        "version": md.get("version"),
                         "chunk_index": chunk_idx,
                         "page": int(md.get("page", 0)),
-                        "title": md.get("document_name") or md.get("title") or None,
-                        "url": url,
-                        "excerpt": text_excerpt,
+                        "source_url": md.get("source_url") or md.get("chunk_url"),
                     }
                 )
 
         # Build system message with context and evidence
         return _build_system_message_and_continue(
-            msgs,
             user_context,
             system_prompt,
             turn_citations,
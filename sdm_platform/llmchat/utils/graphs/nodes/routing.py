@@ -1,11 +1,16 @@
 """Routing nodes - mode-specific logic for determining LLM invocation."""
 
 import logging
+import re
 
 from sdm_platform.llmchat.utils.graphs.base import SdmState
 
 logger = logging.getLogger(__name__)
 
+# Matches the @llm prefix after any leading whitespace without copying the
+# message the way .strip() would
+_LLM_PREFIX_RE = re.compile(r"\s*@llm")
+
 
 def create_assistant_human_turn():
     """
@@ -19,37 +24,21 @@ def create_assistant_human_turn():
         """
         A human is speaking, LLM only responds if invoked with @llm prefix.
         """
-        msgs = state["messages"]
-        user_context = state.get("user_context", "")
-        system_prompt = state.get("system_prompt", "")
-
         try:
             last_msg_content = str(state.get("messages", [])[-1].content)
         except (IndexError, AttributeError) as e:
             logger.exception("No messages found", exc_info=e)
-            return {
-                "messages": msgs,
-                "next_state": "END",
-                "user_context": user_context,
-                "system_prompt": system_prompt,
-                "turn_citations": [],
-            }
+            return {"next_state": "END", "turn_citations": []}
 
         logger.info("assistant_human_turn: %s", last_msg_content[:50])
 
         # ASSISTANT MODE: Only respond to @llm prefix
-        if last_msg_content.strip().startswith("@llm"):
+        if _LLM_PREFIX_RE.match(last_msg_content):
             next_state = "retrieve_and_augment"
         else:
             next_state = "END"
 
-        return {
-            "messages": msgs,
-            "next_state": next_state,
-            "user_context": user_context,
-            "system_prompt": system_prompt,
-            "turn_citations": [],
-        }
+        return {"next_state": next_state, "turn_citations": []}
 
     return human_turn
 
@@ -66,10 +55,6 @@ def create_autonomous_human_turn():
         """
         A human is speaking, LLM always responds to human messages.
         """
-        msgs = state["messages"]
-        user_context = state.get("user_context", "")
-        system_prompt = state.get("system_prompt", "")
-
         try:
             last_msg = state.get("messages", [])[-1]
             last_msg_type = getattr(last_msg, "type", None)
@@ -77,34 +62,16 @@ def create_autonomous_human_turn():
             # Only respond to human messages
             if last_msg_type != "human":
                 logger.debug("autonomous_human_turn: skipping non-human message")
-                return {
-                    "messages": msgs,
-                    "next_state": "END",
-                    "user_context": user_context,
-                    "system_prompt": system_prompt,
-                    "turn_citations": [],
-                }
+                return {"next_state": "END", "turn_citations": []}
 
             last_msg_content = str(last_msg.content)
         except (IndexError, AttributeError) as e:
             logger.exception("No messages found", exc_info=e)
-            return {
-                "messages": msgs,
-                "next_state": "END",
-                "user_context": user_context,
-                "system_prompt": system_prompt,
-                "turn_citations": [],
-            }
+            return {"next_state": "END", "turn_citations": []}
 
         logger.info("autonomous_human_turn: %s", last_msg_content[:50])
 
         # AUTONOMOUS MODE: Always respond to human messages
-        return {
-            "messages": msgs,
-            "next_state": "retrieve_and_augment",
-            "user_context": user_context,
-            "system_prompt": system_prompt,
-            "turn_citations": [],
-        }
+        return {"next_state": "retrieve_and_augment", "turn_citations": []}
 
     return human_turn
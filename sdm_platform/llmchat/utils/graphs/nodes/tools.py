@@ -79,9 +79,6 @@ def create_execute_tools_node():
         return {
             "messages": tool_results,
             "next_state": "call_model",
-            "user_context": state.get("user_context", ""),
-            "system_prompt": state.get("system_prompt", ""),
-            "turn_citations": state.get("turn_citations", []) or [],
             "turn_decision_aids": decision_aids,
         }
 
@@ -1,12 +1,25 @@
 """Decision aid tools for displaying visual content during conversations."""
 
 import re
-from urllib.parse import parse_qs
-from urllib.parse import urlparse
 
 from langchain_core.tools import tool
 
 
+# Video page URLs that have an iframe-embeddable equivalent, matched in one pass:
+# youtube.com/watch?v=ID, youtu.be/ID and vimeo.com/ID (any subdomain)
+_VIDEO_URL_RE = re.compile(
+    r"""
+    ^(?:https?:)?//(?:[\w-]+\.)*
+    (?:
+        youtube\.com/watch\?(?:[^#]*&)?v=(?P<youtube>[^&#]+)
+      | youtu\.be/(?P<youtu_be>[^?#/]+)
+      | vimeo\.com/(?P<vimeo>\d+)
+    )
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+
+
 def _convert_to_embed_url(url: str) -> str:
     """
     Convert YouTube/Vimeo watch URLs to embed URLs.
@@ -20,27 +33,14 @@ def _convert_to_embed_url(url: str) -> str:
     if not url:
         return url
 
-    parsed = urlparse(url)
-
-    # YouTube: youtube.com/watch?v=VIDEO_ID or youtu.be/VIDEO_ID
-    if "youtube.com" in parsed.netloc and parsed.path == "/watch":
-        video_id = parse_qs(parsed.query).get("v", [None])[0]
-        if video_id:
-            return f"https://www.youtube.com/embed/{video_id}"
-    elif "youtu.be" in parsed.netloc:
-        video_id = parsed.path.lstrip("/").split("?")[0]
-        if video_id:
-            return f"https://www.youtube.com/embed/{video_id}"
-
-    # Vimeo URLs like vimeo.com/123456789
-    if "vimeo.com" in parsed.netloc and "/video/" not in parsed.path:
-        # Extract video ID from path like /123456789
-        match = re.match(r"/(\d+)", parsed.path)
-        if match:
-            return f"https://player.vimeo.com/video/{match.group(1)}"
-
-    # Already an embed URL or unknown format - return as-is
-    return url
+    match = _VIDEO_URL_RE.match(url)
+    if not match:
+        # Already an embed URL or unknown format - return as-is
+        return url
+
+    if video_id := match["youtube"] or match["youtu_be"]:
+        return f"https://www.youtube.com/embed/{video_id}"
+    return f"https://player.vimeo.com/video/{match['vimeo']}"
 
 
 @tool
@@ -16,6 +16,7 @@ from sdm_platform.utils.responses import json_success
 
 from .models import Conversation
 from .utils.chat_history import get_chat_history
+from .utils.citations import hydrate_citations
 from .utils.format import format_message
 from .utils.graphs import get_compiled_graph
 from .utils.graphs import get_postgres_checkpointer
@@ -126,12 +127,25 @@ def history(request, conversation_id):
 
     data = {}
     with get_postgres_checkpointer() as checkpointer:
+        # A thread with no checkpoint has no history; skip the graph and the
+        # full state-history scan (one indexed lookup instead of O(history))
+        if checkpointer.get_tuple(config) is None:
+            return JsonResponse({"messages": []})
         graph = get_compiled_graph(checkpointer)
         full_history = list(graph.get_state_history(config=config))
         chat_history = get_chat_history(full_history)
+        # Hydrate every turn's citations together: one chunk lookup, not one per turn
+        history_citations = hydrate_citations(
+            [c for turn in chat_history for c in turn.get("turn_citations", [])],
+        )
+        citation_offset = 0
         msg_list = []
         for turn in chat_history:
-            turn_citations = turn.get("turn_citations", [])
+            citation_count = len(turn.get("turn_citations", []))
+            turn_citations = history_citations[
+                citation_offset : citation_offset + citation_count
+            ]
+            citation_offset += citation_count
             turn_decision_aids = turn.get("turn_decision_aids", [])
 
             for msg in turn["new_messages"]:
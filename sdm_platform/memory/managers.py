@@ -9,6 +9,9 @@ from functools import wraps
 from typing import Optional
 
 from langgraph.store.base import BaseStore
+from langgraph.store.base import GetOp
+from langgraph.store.base import Item
+from langgraph.store.base import PutOp
 from pydantic import ValidationError
 
 from sdm_platform.memory.schemas import ConversationPointMemory
@@ -107,6 +110,73 @@ class UserProfileManager:
 
         # Get existing profile or start fresh
         existing = store.get(namespace, cls.PROFILE_KEY)  # type: ignore[union-attr]
+        profile = cls._merge_profile(existing, updates, source)
+
+        # Store in LangGraph store
+        store.put(namespace, cls.PROFILE_KEY, profile.model_dump(mode="json"))  # type: ignore[union-attr]
+
+        logger.info("Updated profile for %s: %s", user_id, list(updates.keys()))
+
+        return profile
+
+    @classmethod
+    @with_store
+    def update_profiles_bulk(
+        cls,
+        profiles: dict[str, dict],
+        store: Optional[BaseStore] = None,
+        source: str = "llm_extraction",
+    ) -> dict[str, UserProfileMemory]:
+        """
+        Update several user profiles with one batched read and one batched write.
+
+        Same merge semantics as update_profile, but the store is hit twice in
+        total rather than twice per user.
+
+        Args:
+            profiles: Mapping of user identifier to dictionary of fields to update
+            store: Optional store instance
+            source: Source of the updates (llm_extraction, user_input, system)
+
+        Returns:
+            Mapping of user identifier to updated UserProfileMemory
+        """
+        if not profiles:
+            return {}
+
+        namespaces = {
+            user_id: get_user_namespace(user_id, "profile") for user_id in profiles
+        }
+        existing = store.batch(  # type: ignore[union-attr]
+            [GetOp(namespace, cls.PROFILE_KEY) for namespace in namespaces.values()],
+        )
+        updated = {
+            user_id: cls._merge_profile(item, updates, source)
+            for (user_id, updates), item in zip(profiles.items(), existing, strict=True)
+        }
+        store.batch(  # type: ignore[union-attr]
+            [
+                PutOp(
+                    namespaces[user_id],
+                    cls.PROFILE_KEY,
+                    profile.model_dump(mode="json"),
+                )
+                for user_id, profile in updated.items()
+            ],
+        )
+
+        logger.info("Updated profiles for %d users", len(updated))
+
+        return updated
+
+    @classmethod
+    def _merge_profile(
+        cls,
+        existing: Optional[Item],
+        updates: dict,
+        source: str,
+    ) -> UserProfileMemory:
+        """Merge non-None updates into an existing stored profile and validate."""
         current_data = dict(existing.value) if existing else {}
 
         # Merge updates (only non-None values)
@@ -119,14 +189,7 @@ class UserProfileManager:
         current_data["source"] = source
 
         # Validate through Pydantic
-        profile = UserProfileMemory(**current_data)
-
-        # Store in LangGraph store
-        store.put(namespace, cls.PROFILE_KEY, profile.model_dump(mode="json"))  # type: ignore[union-attr]
-
-        logger.info("Updated profile for %s: %s", user_id, list(updates.keys()))
-
-        return profile
+        return UserProfileMemory(**current_data)
 
     @classmethod
     def format_for_prompt(cls, profile: Optional[UserProfileMemory]) -> str:
@@ -6,6 +6,7 @@
 # PTC027 is assertRaises
 """Tests for memory module."""
 
+from contextlib import ExitStack
 from datetime import UTC
 from datetime import date
 from datetime import datetime
@@ -14,12 +15,18 @@ from unittest.mock import MagicMock
 from unittest.mock import patch
 
 from django.test import TestCase
+from django.test import override_settings
 
 from sdm_platform.memory.managers import UserProfileManager
 from sdm_platform.memory.schemas import UserProfileMemory
 from sdm_platform.memory.store import get_user_namespace
 from sdm_platform.users.models import User
 
+# create_user() hashes passwords; under `manage.py test` the project's
+# PBKDF2/Argon2 hashers would dominate setup time
+fast_password_hashers = override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
 
 class UserProfileMemorySchemaTest(TestCase):
     """Test the UserProfileMemory Pydantic schema."""
@@ -134,6 +141,7 @@ class UserNamespaceTest(TestCase):
         self.assertEqual(namespace[3], "custom_type")
 
 
+@fast_password_hashers
 class UserProfileManagerTest(TestCase):
     """Test the UserProfileManager."""
 
@@ -286,6 +294,51 @@ class UserProfileManagerTest(TestCase):
         self.assertGreaterEqual(profile.updated_at, before)
         self.assertLessEqual(profile.updated_at, after)
 
+    def test_update_profiles_bulk_batches_reads_and_writes(self):
+        """Test bulk update merges each profile with one get and one put batch."""
+        existing = MagicMock()
+        existing.value = {
+            "name": "Jane Doe",
+            "birthday": "1985-03-15",
+            "updated_at": datetime.now(UTC).isoformat(),
+            "source": "llm_extraction",
+        }
+        mock_store = MagicMock()
+        mock_store.batch.side_effect = [[existing, None], [None, None]]
+
+        profiles = UserProfileManager.update_profiles_bulk(
+            {
+                self.user_id: {"preferred_name": "Jane"},
+                "other@example.com": {"name": "Bob", "birthday": None},
+            },
+            store=mock_store,
+            source="user_input",
+        )
+
+        self.assertEqual(mock_store.batch.call_count, 2)
+        get_ops, put_ops = (c.args[0] for c in mock_store.batch.call_args_list)
+        self.assertEqual(len(get_ops), 2)
+        self.assertEqual(len(put_ops), 2)
+        mock_store.get.assert_not_called()
+        mock_store.put.assert_not_called()
+
+        jane = profiles[self.user_id]
+        self.assertEqual(jane.name, "Jane Doe")  # Preserved
+        self.assertEqual(jane.preferred_name, "Jane")  # Added
+        self.assertEqual(jane.source, "user_input")
+        self.assertEqual(profiles["other@example.com"].name, "Bob")
+        self.assertIsNone(profiles["other@example.com"].birthday)
+
+    def test_update_profiles_bulk_empty(self):
+        """Test bulk update with no profiles doesn't touch the store."""
+        mock_store = MagicMock()
+
+        self.assertEqual(
+            UserProfileManager.update_profiles_bulk({}, store=mock_store),
+            {},
+        )
+        mock_store.batch.assert_not_called()
+
     def test_format_for_prompt_empty_profile(self):
         """Test formatting empty profile returns empty string."""
         result = UserProfileManager.format_for_prompt(None)
@@ -350,9 +403,23 @@ class UserProfileManagerTest(TestCase):
         self.assertEqual(result, "")
 
 
+@fast_password_hashers
 class MemoryExtractionTaskTest(TestCase):
     """Test the memory extraction Celery task."""
 
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Patched once for the class; setUp resets them between tests
+        resources = ExitStack()
+        cls.addClassCleanup(resources.close)
+        cls.mock_init_model = resources.enter_context(
+            patch("sdm_platform.memory.tasks.init_chat_model"),
+        )
+        cls.mock_update = resources.enter_context(
+            patch("sdm_platform.memory.tasks.UserProfileManager.update_profile"),
+        )
+
     def setUp(self):
         """Set up test fixtures."""
         self.user = User.objects.create_user(
@@ -360,19 +427,21 @@ class MemoryExtractionTaskTest(TestCase):
             password="testpass123",
         )
         self.user_id = self.user.email
+        self.mock_init_model.reset_mock(return_value=True)
+        self.mock_update.reset_mock()
 
-    @patch("sdm_platform.memory.tasks.UserProfileManager.update_profile")
-    @patch("sdm_platform.memory.tasks.init_chat_model")
-    def test_extraction_with_profile_data(self, mock_init_model, mock_update):
+    def _set_llm_response(self, content):
+        """Make the patched extraction model reply with ``content``."""
+        mock_model = MagicMock()
+        mock_model.invoke.return_value.content = content
+        self.mock_init_model.return_value = mock_model
+
+    def test_extraction_with_profile_data(self):
         """Test extraction successfully identifies profile data."""
         from sdm_platform.memory.tasks import extract_user_profile_memory
 
         # Mock LLM response
-        mock_model = MagicMock()
-        mock_response = MagicMock()
-        mock_response.content = '{"name": "Jane Doe", "birthday": "1985-03-15"}'
-        mock_model.invoke.return_value = mock_response
-        mock_init_model.return_value = mock_model
+        self._set_llm_response('{"name": "Jane Doe", "birthday": "1985-03-15"}')
 
         messages = [
             {"role": "user", "content": "Hi, my name is Jane Doe"},
@@ -383,25 +452,19 @@ class MemoryExtractionTaskTest(TestCase):
         extract_user_profile_memory(self.user_id, messages)
 
         # Verify update_profile was called with extracted data
-        mock_update.assert_called_once()
-        call_args = mock_update.call_args
+        self.mock_update.assert_called_once()
+        call_args = self.mock_update.call_args
         self.assertEqual(call_args[1]["user_id"], self.user_id)
         self.assertEqual(call_args[1]["updates"]["name"], "Jane Doe")
         self.assertEqual(call_args[1]["updates"]["birthday"], date(1985, 3, 15))
         self.assertEqual(call_args[1]["source"], "llm_extraction")
 
-    @patch("sdm_platform.memory.tasks.UserProfileManager.update_profile")
-    @patch("sdm_platform.memory.tasks.init_chat_model")
-    def test_extraction_with_no_data(self, mock_init_model, mock_update):
+    def test_extraction_with_no_data(self):
         """Test extraction with no profile data doesn't update."""
         from sdm_platform.memory.tasks import extract_user_profile_memory
 
         # Mock LLM response with empty object
-        mock_model = MagicMock()
-        mock_response = MagicMock()
-        mock_response.content = "{}"
-        mock_model.invoke.return_value = mock_response
-        mock_init_model.return_value = mock_model
+        self._set_llm_response("{}")
 
         messages = [
             {"role": "user", "content": "What's the weather like?"},
@@ -411,44 +474,31 @@ class MemoryExtractionTaskTest(TestCase):
         extract_user_profile_memory(self.user_id, messages)
 
         # Verify update_profile was NOT called
-        mock_update.assert_not_called()
+        self.mock_update.assert_not_called()
 
-    @patch("sdm_platform.memory.tasks.UserProfileManager.update_profile")
-    @patch("sdm_platform.memory.tasks.init_chat_model")
-    def test_extraction_handles_markdown_code_blocks(
-        self, mock_init_model, mock_update
-    ):
+    def test_extraction_handles_markdown_code_blocks(self):
         """Test extraction handles LLM wrapping JSON in markdown."""
         from sdm_platform.memory.tasks import extract_user_profile_memory
 
         # Mock LLM response with markdown wrapper
-        mock_model = MagicMock()
-        mock_response = MagicMock()
-        mock_response.content = '```json\n{"name": "John Smith"}\n```'
-        mock_model.invoke.return_value = mock_response
-        mock_init_model.return_value = mock_model
+        self._set_llm_response('```json\n{"name": "John Smith"}\n```')
 
         messages = [{"role": "user", "content": "I'm John Smith"}]
 
         extract_user_profile_memory(self.user_id, messages)
 
         # Verify update_profile was called
-        mock_update.assert_called_once()
-        call_args = mock_update.call_args
+        self.mock_update.assert_called_once()
+        call_args = self.mock_update.call_args
         self.assertEqual(call_args[1]["updates"]["name"], "John Smith")
 
     @patch("sdm_platform.memory.tasks.logger")
-    @patch("sdm_platform.memory.tasks.init_chat_model")
-    def test_extraction_handles_invalid_json(self, mock_init_model, mock_logger):
+    def test_extraction_handles_invalid_json(self, mock_logger):
         """Test extraction handles invalid JSON gracefully."""
         from sdm_platform.memory.tasks import extract_user_profile_memory
 
         # Mock LLM response with invalid JSON
-        mock_model = MagicMock()
-        mock_response = MagicMock()
-        mock_response.content = "This is not JSON"
-        mock_model.invoke.return_value = mock_response
-        mock_init_model.return_value = mock_model
+        self._set_llm_response("This is not JSON")
 
         messages = [{"role": "user", "content": "Hello"}]
 
@@ -955,6 +1005,7 @@ class ConversationPointManagerTest(TestCase):
         assert memories[0].conversation_point_slug == "treatment-goals"
 
 
+@fast_password_hashers
 class ConversationPointExtractionTaskTest(TestCase):
     """Test conversation point memory extraction task."""
 
@@ -1533,6 +1584,7 @@ class ConversationSummarySchemaTest(TestCase):
         assert summary_data.narrative_summary == "This is the narrative summary text."
 
 
+@fast_password_hashers
 class ConversationSummaryServiceTest(TestCase):
     """Test ConversationSummaryService."""
 
@@ -1880,6 +1932,7 @@ class PDFGeneratorTest(TestCase):
         assert pdf_bytes.startswith(b"%PDF")
 
 
+@fast_password_hashers
 class ConversationSummaryViewsTest(TestCase):
     """Test conversation summary API endpoints."""
 
@@ -2067,6 +2120,7 @@ class ConversationSummaryViewsTest(TestCase):
         assert response.status_code == 404
 
 
+@fast_password_hashers
 class ConversationSummaryTaskTest(TestCase):
     """Test conversation summary generation task."""
 